@@ -1,8 +1,31 @@
 import pygame
 import sys
+import os
 from pygame import Vector2
 import time
 import math
+import heapq
+import hashlib
+import json
+import argparse
+from types import MappingProxyType
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # Telemetry is optional
+    np = None
+
+try:
+    import tomllib
+except ImportError:  # Python before 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:  # TOML level files are optional, JSON always works
+        tomllib = None
 
 # Initialize Pygame
 pygame.init()
@@ -13,6 +36,25 @@ BLOCK_SIZE = 50
 GRID_SIZE = WINDOW_SIZE // BLOCK_SIZE
 FPS = 60
 MOVE_DELAY = 150  # Milliseconds between moves
+KEY_REPEAT_DELAY = MOVE_DELAY  # Milliseconds a key must be held before it repeats
+INPUT_QUEUE_SIZE = 8  # Pending key presses kept before new ones are dropped
+SCORE_TICK_MS = 1000  # Score only changes once a second, so idle frames wake at this rate
+SCORE_TICK = pygame.USEREVENT + 1
+HINT_BUDGET_MS = 2  # Search time allowed per frame so the hint never drops a frame
+THUMBNAIL_SIZE = 120
+THUMBNAIL_COLUMNS = 5
+THUMBNAIL_CELL = WINDOW_SIZE // THUMBNAIL_COLUMNS  # Thumbnail plus its label and padding
+THUMBNAIL_VERSION = 1  # Bump when Level.draw changes so cached thumbnails re-render
+THUMBNAIL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".thumbnails")
+LEVEL_FILE_CHANGED = pygame.USEREVENT + 2
+LEVEL_FILE_EXTENSIONS = (".json", ".toml")
+LEVEL_WATCH_INTERVAL = 0.03  # Seconds between level directory polls, well inside the reload budget
+PROFILE_INTERVAL = 0.005  # Seconds between profiler samples, one Python thread switch interval
+PROFILE_PATH = "omgwip-profile.folded"
+EDITOR_BUDGET_MS = 4  # Reachability repair time per editor frame
+EDITOR_TOOLS = ("walls", "ice", "one_way_paths", "teleporters", "portals", "buttons", "keys", "color_switches",
+                "color_doors", "moving_platforms", "rotating_blocks", "player", "goal")
+REACHABLE_TINT = (0, 200, 0, 60)
 
 # Colors
 WHITE = (255, 255, 255)
@@ -37,6 +79,18 @@ COLORS = {
     "orange": ORANGE
 }
 
+# Telemetry count channels, the first axis of each per-level count array
+VISITS, BLOCKED, RESTARTS = range(3)
+TELEMETRY_CHANNELS = ("visits", "blocked", "restarts")
+
+# Arrow keys mapped to grid directions
+KEY_DIRECTIONS = {
+    pygame.K_LEFT: (-1, 0),
+    pygame.K_RIGHT: (1, 0),
+    pygame.K_UP: (0, -1),
+    pygame.K_DOWN: (0, 1)
+}
+
 class Block:
     def __init__(self, pos, color, block_type="wall"):
         self.pos = Vector2(pos[0], pos[1])
@@ -108,8 +162,9 @@ class Block:
                 if arrow_points:
                     pygame.draw.polygon(screen, BLACK, arrow_points)
 
-    def update(self):
-        current_time = pygame.time.get_ticks()
+    def update(self, current_time=None):
+        if current_time is None:
+            current_time = pygame.time.get_ticks()
         
         if self.block_type == "moving_platform":
             # Update position based on movement pattern
@@ -135,27 +190,34 @@ class Block:
 
 class Level:
     def __init__(self, level_data):
-        self.walls = []
-        self.moving_platforms = []
-        self.rotating_blocks = []
-        self.teleporters = []
-        self.portals = []
-        self.ice = []
-        self.one_way_paths = []
-        self.color_switches = []
-        self.color_doors = []
-        self.buttons = []
-        self.doors = []
-        self.keys = []
-        
-        # Add walls
-        for wall_pos in level_data.get("walls", []):
+        # Each entity layer is built by its own method so edits can rebuild one layer
+        for name in LEVEL_LAYERS:
+            setattr(self, name, getattr(self, "build_" + name)(level_data.get(name, [])))
+            
+        # Ensure player and goal positions are valid
+        self.player = Block(self.start_pos(level_data), RED, "player")
+        self.goal = self.build_goal(level_data)
+        self.start_time = time.time()
+        self.paused_at = None  # Set while the score clock is stopped
+        self.moves = 0
+        self.sliding = False
+        self.slide_direction = Vector2(0, 0)
+        self.active_color = None
+        self.static_layer = None  # Background, ice, one-way paths and walls never change
+        self.move_table = None  # Compiled on the first move unless shared through the catalog
+        self.telemetry = None  # Per-cell count array when telemetry is on
+
+    def build_walls(self, data):
+        walls = []
+        for wall_pos in data:
             if 0 <= wall_pos[0] < GRID_SIZE and 0 <= wall_pos[1] < GRID_SIZE:
                 wall = Block(wall_pos, GRAY)
-                self.walls.append(wall)
+                walls.append(wall)
+        return walls
             
-        # Add moving platforms
-        for platform_data in level_data.get("moving_platforms", []):
+    def build_moving_platforms(self, data):
+        platforms = []
+        for platform_data in data:
             pos = platform_data["pos"]
             if 0 <= pos[0] < GRID_SIZE and 0 <= pos[1] < GRID_SIZE:
                 platform = Block(pos, BLUE, "moving_platform")
@@ -163,29 +225,34 @@ class Level:
                 platform.direction = Vector2(dir_x, dir_y)
                 platform.move_range = platform_data.get("range", 3)
                 platform.speed = platform_data.get("speed", 0.02)
-                self.moving_platforms.append(platform)
+                platforms.append(platform)
+        return platforms
             
-        # Add rotating blocks
-        for block_data in level_data.get("rotating_blocks", []):
+    def build_rotating_blocks(self, data):
+        blocks = []
+        for block_data in data:
             pos = block_data["pos"]
             if 0 <= pos[0] < GRID_SIZE and 0 <= pos[1] < GRID_SIZE:
                 block = Block(pos, BROWN, "rotating_block")
                 block.speed = block_data.get("speed", 0.001)
                 dir_x, dir_y = block_data.get("direction", (1, 0))
                 block.direction = Vector2(dir_x, dir_y)
-                self.rotating_blocks.append(block)
+                blocks.append(block)
+        return blocks
             
-        # Add teleporters
-        for teleporter_data in level_data.get("teleporters", []):
+    def build_teleporters(self, data):
+        teleporters = []
+        for teleporter_data in data:
             pos = teleporter_data["pos"]
             if 0 <= pos[0] < GRID_SIZE and 0 <= pos[1] < GRID_SIZE:
                 teleporter = Block(pos, PURPLE, "teleporter")
                 target_x, target_y = teleporter_data["target"]
                 teleporter.target = Vector2(target_x, target_y)
-                self.teleporters.append(teleporter)
+                teleporters.append(teleporter)
+        return teleporters
             
-        # Add portals
-        portals = level_data.get("portals", [])
+    def build_portals(self, portals):
+        blocks = []
         for i in range(0, len(portals), 2):
             if i + 1 < len(portals):
                 portal1_pos = portals[i]
@@ -194,81 +261,139 @@ class Level:
                     0 <= portal2_pos[0] < GRID_SIZE and 0 <= portal2_pos[1] < GRID_SIZE):
                     portal1 = Block(portal1_pos, CYAN, "portal")
                     portal2 = Block(portal2_pos, CYAN, "portal")
-                    self.portals.extend([portal1, portal2])
+                    blocks.extend([portal1, portal2])
+        return blocks
             
-        # Add ice blocks
-        for ice_pos in level_data.get("ice", []):
+    def build_ice(self, data):
+        blocks = []
+        for ice_pos in data:
             if 0 <= ice_pos[0] < GRID_SIZE and 0 <= ice_pos[1] < GRID_SIZE:
                 ice = Block(ice_pos, WHITE, "ice")
-                self.ice.append(ice)
+                blocks.append(ice)
+        return blocks
             
-        # Add one-way paths
-        for path_data in level_data.get("one_way_paths", []):
+    def build_one_way_paths(self, data):
+        paths = []
+        for path_data in data:
             pos = path_data["pos"]
             if 0 <= pos[0] < GRID_SIZE and 0 <= pos[1] < GRID_SIZE:
                 path = Block(pos, YELLOW, "one_way_path")
                 dir_x, dir_y = path_data["direction"]
                 path.direction = Vector2(dir_x, dir_y)
-                self.one_way_paths.append(path)
+                paths.append(path)
+        return paths
             
-        # Add color switches
-        for switch_data in level_data.get("color_switches", []):
+    def build_color_switches(self, data):
+        switches = []
+        for switch_data in data:
             pos = switch_data["pos"]
             if 0 <= pos[0] < GRID_SIZE and 0 <= pos[1] < GRID_SIZE:
                 switch = Block(pos, COLORS[switch_data["color"]], "color_switch")
                 switch.color_key = switch_data["color"]
-                self.color_switches.append(switch)
+                switches.append(switch)
+        return switches
             
-        # Add color doors
-        for door_data in level_data.get("color_doors", []):
+    def build_color_doors(self, data):
+        doors = []
+        for door_data in data:
             pos = door_data["pos"]
             if 0 <= pos[0] < GRID_SIZE and 0 <= pos[1] < GRID_SIZE:
                 door = Block(pos, COLORS[door_data["color"]], "color_door")
                 door.color_key = door_data["color"]
-                self.color_doors.append(door)
+                doors.append(door)
+        return doors
             
-        # Add buttons and doors
-        for i, button_pos in enumerate(level_data.get("buttons", [])):
+    def build_buttons(self, data):
+        buttons = []
+        for button_pos in data:
             if 0 <= button_pos[0] < GRID_SIZE and 0 <= button_pos[1] < GRID_SIZE:
                 button = Block(button_pos, RED, "button")
-                self.buttons.append(button)
+                buttons.append(button)
+        return buttons
             
-        for i, door_pos in enumerate(level_data.get("doors", [])):
+    def build_doors(self, data):
+        doors = []
+        for door_pos in data:
             if 0 <= door_pos[0] < GRID_SIZE and 0 <= door_pos[1] < GRID_SIZE:
                 door = Block(door_pos, ORANGE, "door")
-                self.doors.append(door)
+                doors.append(door)
+        return doors
             
-        # Add keys
-        for key_pos in level_data.get("keys", []):
+    def build_keys(self, data):
+        keys = []
+        for key_pos in data:
             if 0 <= key_pos[0] < GRID_SIZE and 0 <= key_pos[1] < GRID_SIZE:
                 key = Block(key_pos, YELLOW, "key")
-                self.keys.append(key)
-            
-        # Ensure player and goal positions are valid
+                keys.append(key)
+        return keys
+
+    def start_pos(self, level_data):
         player_pos = level_data["player"]
-        goal_pos = level_data["goal"]
         if not (0 <= player_pos[0] < GRID_SIZE and 0 <= player_pos[1] < GRID_SIZE):
             player_pos = (1, 1)
+        return player_pos
+
+    def build_goal(self, level_data):
+        goal_pos = level_data["goal"]
         if not (0 <= goal_pos[0] < GRID_SIZE and 0 <= goal_pos[1] < GRID_SIZE):
             goal_pos = (GRID_SIZE-2, GRID_SIZE-2)
+        return Block(goal_pos, BLUE, "goal")
+
+    def reload(self, old_data, new_data):
+        # Rebuilds only the layers that differ between two versions of the level data,
+        # keeping the player, the clock and the state of untouched blocks. Returns the
+        # names of the rebuilt layers.
+        changed = {name for name in LEVEL_LAYERS if old_data.get(name, ()) != new_data.get(name, ())}
+        for name in changed:
+            setattr(self, name, getattr(self, "build_" + name)(new_data.get(name, [])))
+        if "color_doors" in changed and self.active_color is not None:
+            for door in self.color_doors:
+                door.is_active = (door.color_key != self.active_color)
+        if old_data["goal"] != new_data["goal"]:
+            self.goal = self.build_goal(new_data)
+            changed.add("goal")
+
+        # The player stays put unless the edit walled them in or off the grid
+        if not in_grid(self.player.pos) or self.is_collision(self.player.pos):
+            self.set_player_pos(self.start_pos(new_data))
+            self.sliding = False
+            changed.add("player")
+
+        if changed & {"walls", "ice", "one_way_paths"}:
+            self.static_layer = None
+        if changed - {"moving_platforms", "color_doors", "goal", "player"}:
+            self.move_table = None
+        return changed
         
-        self.player = Block(player_pos, RED, "player")
-        self.goal = Block(goal_pos, BLUE, "goal")
+    def start(self, current_time=None):
+        # Restart the clocks for levels that were built ahead of time
         self.start_time = time.time()
-        self.moves = 0
-        self.sliding = False
-        self.slide_direction = Vector2(0, 0)
-        self.active_color = None
+        self.paused_at = None
+        if current_time is None:
+            current_time = pygame.time.get_ticks()
+        for teleporter in self.teleporters:
+            teleporter._last_update = current_time
         
-    def draw(self, screen):
+    def render_static_layer(self):
+        layer = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE))
+        layer.fill(WHITE)
         for ice in self.ice:
-            ice.draw(screen)
+            ice.draw(layer)
         for path in self.one_way_paths:
-            path.draw(screen)
+            path.draw(layer)
+        for wall in self.walls:
+            wall.draw(layer)
+        return layer
+        
+    def draw(self, screen):
+        if self.static_layer is None:
+            self.static_layer = self.render_static_layer()
+        screen.blit(self.static_layer, (0, 0))
         for platform in self.moving_platforms:
             platform.draw(screen)
-        for wall in self.walls:
-            wall.draw(screen)
+            # Walls stay on top of platforms, as when everything was drawn per frame
+            for index in platform.rect.collidelistall(self.walls):
+                self.walls[index].draw(screen)
         for button in self.buttons:
             button.draw(screen)
         for door in self.doors:
@@ -288,17 +413,18 @@ class Level:
         self.goal.draw(screen)
         self.player.draw(screen)
 
-    def update(self):
-        # Update all blocks that need updating
+    def update(self, current_time=None):
+        # Update all blocks that need updating; replays pass their own clock
         for block in (self.moving_platforms + self.rotating_blocks + self.teleporters):
-            block.update()
+            block.update(current_time)
 
     def is_collision(self, pos):
         return any(wall.pos == pos and wall.is_active for wall in self.walls + self.doors + self.moving_platforms)
 
     def check_button_press(self, pos):
         for i, button in enumerate(self.buttons):
-            if button.pos == pos and button.is_active:
+            # A button without a door toggles nothing, as in the move table
+            if button.pos == pos and button.is_active and i < len(self.doors):
                 self.doors[i].is_active = not self.doors[i].is_active
                 return True
         return False
@@ -352,14 +478,94 @@ class Level:
                 return True
         return False
 
+    def set_player_pos(self, pos):
+        self.player.pos = Vector2(pos[0], pos[1])
+        self.player.rect.x = self.player.pos.x * BLOCK_SIZE
+        self.player.rect.y = self.player.pos.y * BLOCK_SIZE
+
+    def move_player_to(self, pos):
+        # Every move that changes the player's cell lands here, resets don't
+        self.set_player_pos(pos)
+        if self.telemetry is not None:
+            self.record(VISITS, pos)
+
+    def record(self, channel, pos):
+        x, y = int(pos[0]), int(pos[1])
+        if 0 <= x < GRID_SIZE and 0 <= y < GRID_SIZE:
+            self.telemetry[channel, y, x] += 1
+
+    def is_move_blocked(self, move):
+        if move is None:
+            return True
+        if any(self.doors[i].is_active for i in move.doors):
+            return True
+        return any(platform.pos == move.cell for platform in self.moving_platforms)
+
     def move_player(self, direction):
+        if self.move_table is None:
+            self.move_table = MoveTable(self)
+        moves = self.move_table.moves
+        x, y = self.player.pos
+
+        if self.sliding:
+            # Continue sliding in the same direction
+            move = moves.get((x, y, self.slide_direction.x, self.slide_direction.y), UNCOMPILED)
+            if move is UNCOMPILED:
+                return self.move_player_uncompiled(direction)
+            if self.is_move_blocked(move):
+                self.sliding = False
+            else:
+                self.move_player_to(move.cell)
+                if not move.ice:
+                    self.sliding = False
+            return
+
+        key = (x, y, direction.x, direction.y)
+        move = moves.get(key, UNCOMPILED)
+        if move is UNCOMPILED:
+            return self.move_player_uncompiled(direction)
+        if self.is_move_blocked(move):
+            if self.telemetry is not None and key not in self.move_table.one_way_blocked:
+                self.record(BLOCKED, (x, y))
+            return
+        self.moves += 1
+
+        if move.rotating is not None:
+            rotating_dir = self.rotating_blocks[move.rotating].direction
+            if rotating_dir:
+                direction = rotating_dir
+
+        for i, target in move.teleporters:
+            teleporter = self.teleporters[i]
+            if teleporter.cooldown <= 0:
+                teleporter.cooldown = 1000  # 1 second cooldown
+                self.move_player_to(target)
+                return
+
+        if move.button is not None:
+            door = self.doors[move.button]
+            door.is_active = not door.is_active
+        for i in move.keys:
+            if self.keys[i].is_active:
+                self.keys[i].is_active = False
+                break
+        if move.color is not None:
+            self.active_color = move.color
+            for door in self.color_doors:
+                door.is_active = (door.color_key != self.active_color)
+
+        self.move_player_to(move.portal if move.portal is not None else move.cell)
+        if move.ice:
+            self.sliding = True
+            self.slide_direction = direction
+
+    def move_player_uncompiled(self, direction):
+        # Per-entity checks, used when the player or slide direction is off the integer grid
         if self.sliding:
             # Continue sliding in the same direction
             new_pos = self.player.pos + self.slide_direction
             if not self.is_collision(new_pos) and self.check_one_way_path(new_pos, self.slide_direction):
-                self.player.pos = new_pos
-                self.player.rect.x = self.player.pos.x * BLOCK_SIZE
-                self.player.rect.y = self.player.pos.y * BLOCK_SIZE
+                self.move_player_to(new_pos)
                 if not self.check_ice(new_pos):
                     self.sliding = False
             else:
@@ -376,9 +582,7 @@ class Level:
                 
                 teleport_pos = self.check_teleporter(new_pos)
                 if teleport_pos is not None:
-                    self.player.pos = teleport_pos
-                    self.player.rect.x = self.player.pos.x * BLOCK_SIZE
-                    self.player.rect.y = self.player.pos.y * BLOCK_SIZE
+                    self.move_player_to(teleport_pos)
                     return
                 
                 self.check_button_press(new_pos)
@@ -387,13 +591,9 @@ class Level:
                 
                 portal_pos = self.check_portal(new_pos)
                 if portal_pos is not None:
-                    self.player.pos = portal_pos
-                    self.player.rect.x = self.player.pos.x * BLOCK_SIZE
-                    self.player.rect.y = self.player.pos.y * BLOCK_SIZE
+                    self.move_player_to(portal_pos)
                 else:
-                    self.player.pos = new_pos
-                    self.player.rect.x = self.player.pos.x * BLOCK_SIZE
-                    self.player.rect.y = self.player.pos.y * BLOCK_SIZE
+                    self.move_player_to(new_pos)
                 
                 # Check if landed on ice
                 if self.check_ice(new_pos):
@@ -403,10 +603,1361 @@ class Level:
     def is_complete(self):
         return self.player.pos == self.goal.pos
 
+    def is_static(self):
+        # Nothing on screen changes between key presses without these
+        return (not self.moving_platforms and not self.rotating_blocks and not self.sliding and
+                all(teleporter.cooldown <= 0 for teleporter in self.teleporters))
+
+    def pause(self):
+        # Stops the score clock while a menu covers the level
+        self.paused_at = time.time()
+
+    def resume(self):
+        if self.paused_at is not None:
+            self.start_time += time.time() - self.paused_at
+            self.paused_at = None
+
     def get_score(self):
         time_taken = int(time.time() - self.start_time)
         return max(1000 - (time_taken * 10) - (self.moves * 5), 0)
 
+def grid_cell(pos):
+    return (int(round(pos[0])), int(round(pos[1])))
+
+UNCOMPILED = object()  # Table miss: the player or direction is off the integer grid
+
+# The resolved outcome of stepping onto cell. doors lists the door indices there that
+# block while active, and door_mask holds the same doors as bits for the button-toggled
+# ones. teleporters lists (index, target) in the order Level checks them. button, keys,
+# color and portal are the side effects, portal being the destination cell if any.
+Move = namedtuple("Move", "cell doors door_mask teleporters button keys color portal ice rotating")
+
+class MoveTable:
+    # Compiles every (cell, direction) move of a level into one lookup. The result
+    # only depends on door state (blocking doors on the target) and teleporter
+    # cooldowns, both checked on the entry. Color doors take no part in collision, so
+    # color state never changes a move. None marks a move that is always blocked.
+    # A lazy table resolves moves on first lookup instead, for one-off searches over
+    # levels that are never played.
+    def __init__(self, level, lazy=False):
+        self.moves = LazyMoves(self) if lazy else {}
+        self.one_way_blocked = set()  # Keys of moves refused by a one-way path, not a collision
+        self.problems = []
+
+        def cells(blocks):
+            found = {}
+            for i, block in enumerate(blocks):
+                found.setdefault(grid_cell(block.pos), []).append(i)
+            return found
+
+        self.walls = set(cells(level.walls))
+        toggleable = min(len(level.buttons), len(level.doors))
+        self.doors = {}
+        for i, door in enumerate(level.doors):
+            if i < toggleable:
+                self.doors.setdefault(grid_cell(door.pos), []).append(i)
+            else:
+                self.walls.add(grid_cell(door.pos))  # Doors without a button never open
+        self.teleporters = cells(level.teleporters)
+        self.targets = [grid_cell(teleporter.target) for teleporter in level.teleporters]
+        self.buttons = {cell: i[0] for cell, i in cells(level.buttons).items() if i[0] < len(level.doors)}
+        self.keys = cells(level.keys)
+        self.colors = {cell: level.color_switches[i[0]].color_key for cell, i in cells(level.color_switches).items()}
+        self.paths = {cell: level.one_way_paths[i[0]].direction for cell, i in cells(level.one_way_paths).items()}
+        self.rotating = {cell: i[0] for cell, i in cells(level.rotating_blocks).items()}
+        self.ice = set(cells(level.ice))
+        self.portals = {}
+        for i in range(0, len(level.portals) - 1, 2):
+            first, second = grid_cell(level.portals[i].pos), grid_cell(level.portals[i + 1].pos)
+            self.portals.setdefault(first, second)
+            self.portals.setdefault(second, first)
+
+        for i, button in enumerate(level.buttons):
+            if i >= len(level.doors):
+                self.problems.append(f"button {i} at {grid_cell(button.pos)} has no door to toggle")
+        for teleporter in level.teleporters:
+            self.check_target("teleporter", grid_cell(teleporter.pos), grid_cell(teleporter.target), self.walls)
+        for source, dest in self.portals.items():
+            self.check_target("portal", source, dest, self.walls)
+        self.check_chains(level, self.teleporters, self.portals)
+        self.jumps = set(self.teleporters) | set(self.portals)  # Cells that move the player more than one cell
+
+        if not lazy:
+            for x in range(GRID_SIZE):
+                for y in range(GRID_SIZE):
+                    for dx, dy in KEY_DIRECTIONS.values():
+                        self.moves[(x, y, dx, dy)] = self.resolve(x, y, dx, dy)
+
+    def resolve(self, x, y, dx, dy):
+        cell = (x + dx, y + dy)
+        if not in_grid(cell) or cell in self.walls:
+            return None
+        if cell in self.paths:
+            path = self.paths[cell]
+            if not path.x * dx + path.y * dy > 0:
+                self.one_way_blocked.add((x, y, dx, dy))
+                return None
+        door_indices = tuple(self.doors.get(cell, ()))
+        return Move(
+            cell=cell,
+            doors=door_indices,
+            door_mask=sum(1 << i for i in set(door_indices)),
+            teleporters=tuple((i, self.targets[i]) for i in self.teleporters.get(cell, ())),
+            button=self.buttons.get(cell),
+            keys=tuple(self.keys.get(cell, ())),
+            color=self.colors.get(cell),
+            portal=self.portals.get(cell),
+            ice=cell in self.ice,
+            rotating=self.rotating.get(cell)
+        )
+
+    def check_target(self, kind, source, dest, walls):
+        if not in_grid(dest):
+            self.problems.append(f"{kind} at {source} sends the player off the grid to {dest}")
+        elif dest in walls:
+            self.problems.append(f"{kind} at {source} sends the player into a wall at {dest}")
+
+    def check_chains(self, level, teleporters, portals):
+        # Arriving on a teleporter or portal doesn't fire it, so a jump always ends on
+        # its first target. Chains and cycles are still reported since they read as
+        # multi-hop routes in the level data.
+        hops = {cell: grid_cell(level.teleporters[i[0]].target) for cell, i in teleporters.items()}
+        for cell, dest in portals.items():
+            hops.setdefault(cell, dest)
+        reported = set()
+        for start in hops:
+            chain = [start]
+            while chain[-1] in hops and hops[chain[-1]] not in chain:
+                chain.append(hops[chain[-1]])
+            if len(chain) < 3 or frozenset(chain) in reported:
+                continue
+            reported.add(frozenset(chain))
+            route = " -> ".join(str(cell) for cell in chain)
+            if chain[-1] in hops:
+                self.problems.append(f"jump cycle {route} -> {hops[chain[-1]]}; only the first hop is taken")
+            else:
+                self.problems.append(f"jump chain {route}; only the first hop is taken")
+
+class LazyMoves(dict):
+    # Move lookup that resolves each key the first time it is asked for. Only for
+    # integer keys: Level.move_player relies on misses for off-grid positions.
+    def __init__(self, table):
+        super().__init__()
+        self.table = table
+
+    def get(self, key, default=None):
+        if key not in self:
+            self[key] = self.table.resolve(*key)
+        return self[key]
+
+class HintEngine:
+    # Resumable A* from the player's state to the goal, run in small time slices.
+    # A search state is (x, y, door_mask, slide_direction). Door toggles are part of
+    # the state, so pressing buttons never invalidates earlier results. Keys and color
+    # doors take no part in collision, so they don't affect the search at all.
+    # Moving platforms, rotating blocks and teleporter cooldowns depend on time and
+    # are left out.
+    def __init__(self, level):
+        if level.move_table is None:
+            level.move_table = MoveTable(level)
+        self.moves = level.move_table.moves
+        self.jumps = level.move_table.jumps
+        self.goal = grid_cell(level.goal.pos)
+        self.toggleable = min(len(level.buttons), len(level.doors))
+        self.heuristics = {}
+        self.known = {}  # State -> (direction, moves left) for every state on a solved path
+        self.start = None
+        self.done = True
+
+    def state_of(self, level):
+        mask = 0
+        for i in range(self.toggleable):
+            if level.doors[i].is_active:
+                mask |= 1 << i
+        slide = grid_cell(level.slide_direction) if level.sliding else None
+        x, y = grid_cell(level.player.pos)
+        return (x, y, mask, slide)
+
+    def successor(self, state, direction):
+        # Mirrors Level.move_player for one key press
+        x, y, mask, slide = state
+        if slide is not None:
+            move = self.moves.get((x, y) + slide)
+            if move is None or mask & move.door_mask:
+                return (x, y, mask, None)
+            return move.cell + (mask, slide if move.ice else None)
+
+        move = self.moves.get((x, y) + direction)
+        if move is None or mask & move.door_mask:
+            return None
+        if move.teleporters:
+            return move.teleporters[0][1] + (mask, None)
+        if move.button is not None:
+            mask ^= 1 << move.button
+        dest = move.portal if move.portal is not None else move.cell
+        return dest + (mask, direction if move.ice else None)
+
+    def heuristic(self, cell):
+        # Each move covers one cell unless it jumps, so this never overestimates
+        h = self.heuristics.get(cell)
+        if h is None:
+            distances = [abs(cell[0] - jump[0]) + abs(cell[1] - jump[1]) for jump in self.jumps]
+            distances.append(abs(cell[0] - self.goal[0]) + abs(cell[1] - self.goal[1]))
+            h = self.heuristics[cell] = min(distances)
+        return h
+
+    def request(self, state):
+        if state == self.start:
+            return
+        self.start = state
+        self.done = state in self.known or state[:2] == self.goal
+        if not self.done:
+            self.costs = {state: 0}
+            self.parents = {}
+            self.open = [(self.heuristic(state[:2]), 0, 0, state)]
+            self.counter = 0
+
+    def direction(self):
+        entry = self.known.get(self.start)
+        return entry[0] if entry else None
+
+    def step(self, budget_ms=HINT_BUDGET_MS):
+        if self.done:
+            return
+        deadline = time.perf_counter() + budget_ms / 1000
+        expanded = 0
+        while self.open:
+            _, _, cost, state = heapq.heappop(self.open)
+            if cost > self.costs[state]:
+                continue
+            if state[:2] == self.goal or state in self.known:
+                self.record_path(state)
+                return
+            directions = (state[3],) if state[3] is not None else tuple(KEY_DIRECTIONS.values())
+            for direction in directions:
+                nxt = self.successor(state, direction)
+                if nxt is None or nxt == state:
+                    continue
+                if cost + 1 < self.costs.get(nxt, math.inf):
+                    self.costs[nxt] = cost + 1
+                    self.parents[nxt] = (state, direction)
+                    self.counter += 1
+                    heapq.heappush(self.open, (cost + 1 + self.heuristic(nxt[:2]), self.counter, cost + 1, nxt))
+            expanded += 1
+            if expanded % 16 == 0 and time.perf_counter() >= deadline:
+                return
+        # Search exhausted without reaching the goal
+        self.done = True
+
+    def record_path(self, state):
+        # Remember the next move for every state on the path so later queries are lookups
+        remaining = self.known[state][1] if state in self.known else 0
+        while state != self.start:
+            parent, direction = self.parents[state]
+            remaining += 1
+            self.known[parent] = (direction, remaining)
+            state = parent
+        self.done = True
+        self.open = []
+        self.parents = {}
+
+# Bits of a ReachabilityMap entry mask: the move directions a cell can be entered by
+DIRECTION_BITS = {(1, 0): 1, (-1, 0): 2, (0, 1): 4, (0, -1): 8}
+ALL_DIRECTIONS = 15
+
+class ReachabilityMap:
+    # Cells reachable from a source on a width x height grid, kept up to date as
+    # single cells are edited. Each cell has an entry mask of the directions it can be
+    # entered by (0 blocks it), and cells can link to others the way jumps do.
+    # Reachability is held as a spanning tree of parents. Opening a cell grows the
+    # tree from it. Closing one first tries to re-hang the cell, or its children,
+    # from other reached cells outside its subtree, and only a subtree that is really
+    # cut off is cleared and searched again. Edits queue up as tasks that step() runs
+    # within a time budget, in order, so a large repair never stalls a frame.
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        size = width * height
+        self.entry = bytearray([ALL_DIRECTIONS]) * size
+        self.reached = bytearray(size)
+        self.parent = [-1] * size  # Cell each reached cell was found from, -1 for the source
+        self.links = {}  # Cell index -> set of cell indices it jumps to
+        self.linked_from = {}
+        self.source = None
+        self.tasks = deque()
+        self.changed = set()  # Cells whose reachability flipped since take_changed()
+        self.neighbours = tuple((dx, dy, DIRECTION_BITS[(dx, dy)]) for dx, dy in DIRECTION_BITS)
+
+    def index(self, cell):
+        return cell[1] * self.width + cell[0]
+
+    def cell(self, index):
+        return (index % self.width, index // self.width)
+
+    # Edits: each is queued and applied in order by step()
+
+    def set_source(self, cell):
+        self.tasks.append(self.reset_task(self.index(cell)))
+
+    def set_entry(self, cell, mask):
+        self.tasks.append(self.entry_task(self.index(cell), mask))
+
+    def link(self, source, target):
+        self.tasks.append(self.link_task(self.index(source), self.index(target)))
+
+    def unlink(self, source, target):
+        self.tasks.append(self.unlink_task(self.index(source), self.index(target)))
+
+    @property
+    def done(self):
+        return not self.tasks
+
+    def is_reachable(self, cell):
+        return bool(self.reached[self.index(cell)])
+
+    def step(self, budget_ms=HINT_BUDGET_MS):
+        deadline = time.perf_counter() + budget_ms / 1000
+        while self.tasks:
+            try:
+                next(self.tasks[0])
+            except StopIteration:
+                self.tasks.popleft()
+                continue
+            if time.perf_counter() >= deadline:
+                return
+
+    def take_changed(self):
+        changed, self.changed = self.changed, set()
+        return changed
+
+    # Graph
+
+    def successors(self, i):
+        width, entry = self.width, self.entry
+        x, y = i % width, i // width
+        found = [i + dy * width + dx for dx, dy, bit in self.neighbours
+                 if 0 <= x + dx < width and 0 <= y + dy < self.height and entry[i + dy * width + dx] & bit]
+        found.extend(self.links.get(i, ()))
+        return found
+
+    def predecessors(self, i):
+        width, mask = self.width, self.entry[i]
+        x, y = i % width, i // width
+        found = [i - dy * width - dx for dx, dy, bit in self.neighbours
+                 if mask & bit and 0 <= x - dx < width and 0 <= y - dy < self.height]
+        found.extend(self.linked_from.get(i, ()))
+        return found
+
+    def descends_from(self, i, ancestor):
+        while i != -1:
+            if i == ancestor:
+                return True
+            i = self.parent[i]
+        return False
+
+    # Tasks
+
+    def reset_task(self, source):
+        self.changed.update(i for i, reached in enumerate(self.reached) if reached)
+        self.reached = bytearray(len(self.reached))
+        yield
+        self.source = source
+        self.reached[source] = 1
+        self.parent[source] = -1
+        self.changed.add(source)
+        yield from self.grow([source])
+
+    def entry_task(self, i, mask):
+        self.entry[i] = mask
+        if self.source is None or i == self.source:
+            return
+        if self.reached[i]:
+            if i not in self.successors(self.parent[i]):
+                yield from self.repair(i)
+        else:
+            for p in self.predecessors(i):
+                if self.reached[p]:
+                    self.attach(i, p)
+                    yield from self.grow([i])
+                    break
+
+    def link_task(self, a, b):
+        self.links.setdefault(a, set()).add(b)
+        self.linked_from.setdefault(b, set()).add(a)
+        if self.reached[a] and not self.reached[b]:
+            self.attach(b, a)
+            yield from self.grow([b])
+
+    def unlink_task(self, a, b):
+        self.links.get(a, set()).discard(b)
+        self.linked_from.get(b, set()).discard(a)
+        if self.reached[b] and self.parent[b] == a and b != self.source:
+            yield from self.repair(b)
+
+    def attach(self, i, parent):
+        self.reached[i] = 1
+        self.parent[i] = parent
+        self.changed.add(i)
+
+    def reattach(self, i):
+        # Hangs i from a reached predecessor that isn't below it in the tree
+        for p in self.predecessors(i):
+            if self.reached[p] and not self.descends_from(p, i):
+                self.parent[i] = p
+                return True
+        return False
+
+    def repair(self, i):
+        # i lost the edge it was reached through
+        if self.reattach(i):
+            return
+        children = [j for j in self.successors(i) if self.reached[j] and self.parent[j] == i]
+        self.reached[i] = 0
+        self.parent[i] = -1
+        self.changed.add(i)
+        cut = [child for child in children if not self.reattach(child)]
+
+        # Clear everything below the children that couldn't be re-hung
+        orphans = []
+        for child in cut:
+            self.reached[child] = 0
+            self.changed.add(child)
+            orphans.append(child)
+        k = 0
+        while k < len(orphans):
+            o = orphans[k]
+            k += 1
+            for j in self.successors(o):
+                if self.reached[j] and self.parent[j] == o:
+                    self.reached[j] = 0
+                    self.changed.add(j)
+                    orphans.append(j)
+            if k % 256 == 0:
+                yield
+
+        # Orphans still entered from a reached cell come back, and so does what they lead to
+        orphans.append(i)
+        seeds = []
+        for k, o in enumerate(orphans, 1):
+            for p in self.predecessors(o):
+                if self.reached[p]:
+                    self.attach(o, p)
+                    seeds.append(o)
+                    break
+            if k % 256 == 0:
+                yield
+        yield from self.grow(seeds)
+
+    def grow(self, frontier):
+        # Breadth first from reached cells into unreached ones
+        reached, parent, changed = self.reached, self.parent, self.changed
+        queue = deque(frontier)
+        count = 0
+        while queue:
+            i = queue.popleft()
+            if not reached[i]:
+                continue
+            for j in self.successors(i):
+                if not reached[j]:
+                    reached[j] = 1
+                    parent[j] = i
+                    changed.add(j)
+                    queue.append(j)
+            count += 1
+            if count % 256 == 0:
+                yield
+
+def draw_hint(screen, level, direction):
+    x, y = grid_cell(level.player.pos)
+    rect = pygame.Rect((x + direction[0]) * BLOCK_SIZE, (y + direction[1]) * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE)
+    pygame.draw.rect(screen, GREEN, rect, 4)
+    pygame.draw.line(screen, GREEN, level.player.rect.center, rect.center, 3)
+
+class InputQueue:
+    def __init__(self, size=INPUT_QUEUE_SIZE):
+        self.size = size
+        self.pending = deque()  # (direction, perf_counter time it arrived) of each KEYDOWN
+        self.held = {}  # Arrow key -> time it was pressed
+        self.applied = []  # Arrival times of moves applied but not yet on screen
+        self.latencies = []  # Milliseconds from KEYDOWN to the frame showing its move
+        self.dropped = 0
+
+    def press(self, key, timestamp, arrived):
+        self.held[key] = timestamp
+        if len(self.pending) >= self.size:
+            self.dropped += 1
+            return
+        self.pending.append((KEY_DIRECTIONS[key], arrived))
+
+    def release(self, key):
+        self.held.pop(key, None)
+
+    def clear(self):
+        self.pending.clear()
+
+    def reset(self):
+        # Also forgets held keys, for when their KEYUP events go elsewhere
+        self.pending.clear()
+        self.held.clear()
+
+    def is_idle(self):
+        return not self.pending and not self.held
+
+    def next_move(self, current_time, last_move_time):
+        # Queued presses apply one per simulation step so quick taps are never lost
+        if self.pending:
+            direction, arrived = self.pending.popleft()
+            self.applied.append(arrived)
+            return Vector2(direction)
+
+        # Key repeat only kicks in for the most recently pressed key still held
+        if self.held and current_time - last_move_time >= MOVE_DELAY:
+            key, pressed_at = max(self.held.items(), key=lambda item: item[1])
+            if current_time - pressed_at >= KEY_REPEAT_DELAY:
+                return Vector2(KEY_DIRECTIONS[key])
+        return None
+
+    def shown(self, flip_time):
+        # Called after the flip that puts applied moves on screen
+        self.latencies.extend((flip_time - arrived) * 1000 for arrived in self.applied)
+        self.applied.clear()
+
+    def report(self):
+        if not self.latencies:
+            return "Input latency: no moves recorded"
+        ordered = sorted(self.latencies)
+        p50 = ordered[len(ordered) // 2]
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return (f"Input latency over {len(ordered)} moves: "
+                f"p50 {p50:.1f} ms, p99 {p99:.1f} ms, max {ordered[-1]:.1f} ms, dropped {self.dropped}")
+
+class HudText:
+    # Caches the rendered surface so text is only re-rendered when it changes
+    def __init__(self, font, color=BLACK):
+        self.font = font
+        self.color = color
+        self.text = None
+        self.surface = None
+
+    def set(self, text):
+        if text == self.text:
+            return False
+        self.text = text
+        self.surface = self.font.render(text, True, self.color)
+        return True
+
+# Every entity layer of the level dict schema
+LEVEL_LAYERS = ("walls", "moving_platforms", "rotating_blocks", "teleporters", "portals", "ice",
+                "one_way_paths", "color_switches", "color_doors", "buttons", "doors", "keys")
+
+def in_grid(pos):
+    return 0 <= pos[0] < GRID_SIZE and 0 <= pos[1] < GRID_SIZE
+
+def canonical_level(level_data):
+    # Puts level data into a canonical form that Level builds identically from.
+    # Out-of-grid entries are dropped just as Level drops them and defaults are
+    # filled in. Layers where order has no effect are sorted. Layers where the first
+    # entry on a cell wins are stably sorted by cell. Buttons, doors and portals keep
+    # their order because they are paired by index.
+    def cell(pos):
+        return (int(pos[0]), int(pos[1]))
+
+    def entry(**fields):
+        return MappingProxyType(fields)
+
+    def by_cell(item):
+        return item["pos"]
+
+    def by_fields(item):
+        return tuple(item.values())
+
+    portals = level_data.get("portals", [])
+    pairs = [(cell(portals[i]), cell(portals[i + 1])) for i in range(0, len(portals) - 1, 2)]
+    player = cell(level_data["player"])
+    goal = cell(level_data["goal"])
+
+    canonical = {
+        "player": player if in_grid(player) else (1, 1),
+        "goal": goal if in_grid(goal) else (GRID_SIZE-2, GRID_SIZE-2),
+        "walls": tuple(sorted({cell(pos) for pos in level_data.get("walls", []) if in_grid(pos)})),
+        "moving_platforms": tuple(sorted((
+            entry(pos=cell(data["pos"]), direction=tuple(data["direction"]),
+                  range=data.get("range", 3), speed=data.get("speed", 0.02))
+            for data in level_data.get("moving_platforms", []) if in_grid(data["pos"])), key=by_fields)),
+        "rotating_blocks": tuple(sorted((
+            entry(pos=cell(data["pos"]), speed=data.get("speed", 0.001),
+                  direction=tuple(data.get("direction", (1, 0))))
+            for data in level_data.get("rotating_blocks", []) if in_grid(data["pos"])), key=by_cell)),
+        "teleporters": tuple(sorted((
+            entry(pos=cell(data["pos"]), target=tuple(data["target"]))
+            for data in level_data.get("teleporters", []) if in_grid(data["pos"])), key=by_cell)),
+        "portals": tuple(pos for pair in pairs if in_grid(pair[0]) and in_grid(pair[1]) for pos in pair),
+        "ice": tuple(sorted({cell(pos) for pos in level_data.get("ice", []) if in_grid(pos)})),
+        "one_way_paths": tuple(sorted((
+            entry(pos=cell(data["pos"]), direction=tuple(data["direction"]))
+            for data in level_data.get("one_way_paths", []) if in_grid(data["pos"])), key=by_cell)),
+        "color_switches": tuple(sorted((
+            entry(pos=cell(data["pos"]), color=data["color"])
+            for data in level_data.get("color_switches", []) if in_grid(data["pos"])), key=by_cell)),
+        "color_doors": tuple(sorted((
+            entry(pos=cell(data["pos"]), color=data["color"])
+            for data in level_data.get("color_doors", []) if in_grid(data["pos"])), key=by_fields)),
+        "buttons": tuple(cell(pos) for pos in level_data.get("buttons", []) if in_grid(pos)),
+        "doors": tuple(cell(pos) for pos in level_data.get("doors", []) if in_grid(pos)),
+        "keys": tuple(sorted(cell(pos) for pos in level_data.get("keys", []) if in_grid(pos)))
+    }
+    return MappingProxyType(canonical)
+
+def thaw_level(level_data):
+    # Plain dicts and lists in the level dict schema, for pickling and saving
+    def thaw(value):
+        if isinstance(value, (dict, MappingProxyType)):
+            return {key: thaw(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [thaw(item) for item in value]
+        return value
+    return thaw(level_data)
+
+def level_hash(level_data):
+    encoded = json.dumps(thaw_level(canonical_level(level_data)), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()[:16]
+
+class LevelCatalog:
+    # Identical levels share one immutable data object and one artifact cache entry
+    def __init__(self, levels):
+        self.levels = []
+        self.hashes = []
+        self.unique = {}  # Hash -> canonical level data
+        self.artifacts = {}  # (hash, name) -> compiled grids, render caches, solver results
+        for level_data in levels:
+            self.append(level_data)
+
+    def intern(self, level_data):
+        key = level_hash(level_data)
+        if key not in self.unique:
+            self.unique[key] = canonical_level(level_data)
+        return key
+
+    def append(self, level_data):
+        key = self.intern(level_data)
+        self.levels.append(self.unique[key])
+        self.hashes.append(key)
+
+    def replace(self, index, level_data):
+        # Artifacts are keyed by hash, so the old version's stay valid for other levels
+        key = self.intern(level_data)
+        self.levels[index] = self.unique[key]
+        self.hashes[index] = key
+
+    def __len__(self):
+        return len(self.levels)
+
+    def __getitem__(self, index):
+        return self.levels[index]
+
+    def artifact(self, index, name, build):
+        key = (self.hashes[index], name)
+        if key not in self.artifacts:
+            self.artifacts[key] = build()
+        return self.artifacts[key]
+
+    def report(self):
+        groups = {}
+        for index, key in enumerate(self.hashes):
+            groups.setdefault(key, []).append(index + 1)
+        lines = [f"{len(self.levels)} levels, {len(self.unique)} unique"]
+        for key, numbers in groups.items():
+            if len(numbers) > 1:
+                lines.append(f"  {key}: levels {', '.join(str(number) for number in numbers)}")
+        for key, numbers in groups.items():
+            level = build_level(self, numbers[0] - 1)
+            for problem in level.move_table.problems:
+                lines.append(f"  level {numbers[0]}: {problem}")
+        return "\n".join(lines)
+
+class Telemetry:
+    # Per-level counts of visits, blocked moves and restarts for each cell, kept in
+    # memory as NumPy arrays and merged into an .npz store keyed by level hash
+    def __init__(self, path):
+        self.path = path
+        self.counts = {}  # Level hash -> uint32 array of (channel, y, x)
+
+    def grid(self, key):
+        if key not in self.counts:
+            self.counts[key] = np.zeros((len(TELEMETRY_CHANNELS), GRID_SIZE, GRID_SIZE), dtype=np.uint32)
+        return self.counts[key]
+
+    def save(self):
+        merged = dict(load_telemetry(self.path))
+        for key, counts in self.counts.items():
+            if not counts.any():
+                continue
+            merged[key] = merged[key] + counts if key in merged else counts
+        partial = f"{self.path}.{os.getpid()}.npz"
+        np.savez_compressed(partial, **merged)
+        os.replace(partial, self.path)
+        self.counts = {}
+
+def load_telemetry(path):
+    if not os.path.exists(path):
+        return {}
+    with np.load(path) as store:
+        return {key: store[key] for key in store.files}
+
+def build_level(catalog, index, telemetry=None):
+    level = Level(catalog[index])
+    if telemetry is not None:
+        level.telemetry = telemetry.grid(catalog.hashes[index])
+    level.static_layer = catalog.artifact(index, "static_layer", level.render_static_layer)
+    level.move_table = catalog.artifact(index, "moves", lambda: MoveTable(level))
+    return level
+
+def reload_level(catalog, index, level, level_data, telemetry=None):
+    # Swaps edited data into the catalog and the running level. Only changed layers
+    # are rebuilt, and the render cache and move table are kept when their layers
+    # didn't change.
+    old_data = catalog[index]
+    catalog.replace(index, level_data)
+    changed = level.reload(old_data, catalog[index])
+    if telemetry is not None:
+        level.telemetry = telemetry.grid(catalog.hashes[index])
+    static_layer = level.static_layer
+    level.static_layer = catalog.artifact(index, "static_layer", lambda: level.render_static_layer() if static_layer is None else static_layer)
+    move_table = level.move_table
+    level.move_table = catalog.artifact(index, "moves", lambda: MoveTable(level) if move_table is None else move_table)
+    return changed
+
+def read_level_file(path):
+    # One level per file, in the level dict schema
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise ValueError("TOML level files need Python 3.11 or the tomli package")
+        with open(path, "rb") as file:
+            level_data = tomllib.load(file)
+    else:
+        with open(path) as file:
+            level_data = json.load(file)
+    if not isinstance(level_data, dict) or "player" not in level_data or "goal" not in level_data:
+        raise ValueError("a level needs at least a player and a goal")
+    check_level_data(level_data)  # Raises on malformed entries before anything is replaced
+    return level_data
+
+def check_level_data(level_data):
+    # Checks every field Level reads, so a bad file fails here and not halfway
+    # through a build after the catalog has taken it
+    def pair(value, what):
+        if (not isinstance(value, (list, tuple)) or len(value) != 2 or
+                not all(isinstance(n, int) and not isinstance(n, bool) for n in value)):
+            raise ValueError(f"{what} must be a pair of whole numbers, not {value!r}")
+
+    def number(value, what):
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f"{what} must be a number, not {value!r}")
+
+    pair(level_data["player"], "player")
+    pair(level_data["goal"], "goal")
+    for name in LEVEL_LAYERS:
+        entries = level_data.get(name, [])
+        if not isinstance(entries, (list, tuple)):
+            raise ValueError(f"{name} must be a list")
+        for i, entry in enumerate(entries):
+            what = f"{name}[{i}]"
+            if name in ("walls", "portals", "ice", "buttons", "doors", "keys"):
+                pair(entry, what)
+                continue
+            if not isinstance(entry, dict) or "pos" not in entry:
+                raise ValueError(f"{what} needs a pos")
+            pair(entry["pos"], f"{what} pos")
+            if name == "teleporters":
+                pair(entry.get("target"), f"{what} target")
+            elif name in ("moving_platforms", "one_way_paths"):
+                pair(entry.get("direction"), f"{what} direction")
+            elif name == "rotating_blocks" and "direction" in entry:
+                pair(entry["direction"], f"{what} direction")
+            elif name in ("color_switches", "color_doors") and entry.get("color") not in COLORS:
+                raise ValueError(f"{what} color must be one of {', '.join(COLORS)}, not {entry.get('color')!r}")
+            for field in ("range", "speed"):
+                if field in entry:
+                    number(entry[field], f"{what} {field}")
+    canonical_level(level_data)
+
+def level_files(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.endswith(LEVEL_FILE_EXTENSIONS))
+
+def level_file_index(catalog, path):
+    # A file named after a level number (7.json, 012.toml) replaces that level, any
+    # other file is added as a new level
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if stem.isdigit() and 1 <= int(stem) <= len(catalog):
+        return int(stem) - 1
+    return None
+
+def load_level_files(catalog, directory):
+    # Returns the catalog index each file was loaded into
+    indices = {}
+    for path in level_files(directory):
+        try:
+            level_data = read_level_file(path)
+        except Exception as error:
+            print(f"Skipping level file {path}: {error}")
+            continue
+        index = level_file_index(catalog, path)
+        if index is None:
+            catalog.append(level_data)
+            index = len(catalog) - 1
+        else:
+            catalog.replace(index, level_data)
+        indices[path] = index
+    return indices
+
+class LevelWatcher:
+    # Polls a level directory on a background thread and posts a LEVEL_FILE_CHANGED
+    # event for each file that was written, so only that file is parsed again
+    def __init__(self, directory, interval=LEVEL_WATCH_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.stamps = self.scan()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="level-watcher", daemon=True)
+        self.thread.start()
+
+    def scan(self):
+        stamps = {}
+        for path in level_files(self.directory):
+            try:
+                stat = os.stat(path)
+            except OSError:  # Removed between listing and stat
+                continue
+            stamps[path] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            stamps = self.scan()
+            for path, stamp in stamps.items():
+                if self.stamps.get(path) != stamp:
+                    pygame.event.post(pygame.event.Event(LEVEL_FILE_CHANGED, path=path,
+                                                         modified=stamp[0] / 1e9, detected=time.perf_counter()))
+            self.stamps = stamps
+
+    def stop(self):
+        self.stopped.set()
+
+class LevelPreloader:
+    # Builds the next level and its render cache on a worker thread during play
+    def __init__(self, levels, telemetry=None):
+        self.levels = levels
+        self.telemetry = telemetry
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="level-preload")
+        self.index = None
+        self.future = None
+
+    def preload(self, index):
+        if index >= len(self.levels):
+            return
+        self.index = index
+        self.future = self.executor.submit(build_level, self.levels, index, self.telemetry)
+
+    def take(self, index, current_time=None):
+        # Returns the level and whether it was ready without building in this frame
+        if self.future is not None and self.index == index:
+            future, self.future = self.future, None
+            ready = future.done()
+            level = future.result()
+        else:
+            ready = False
+            level = build_level(self.levels, index, self.telemetry)
+        level.start(current_time)
+        return level, ready
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def render_thumbnail(level_data, path, size=THUMBNAIL_SIZE):
+    # Runs in a worker process: draws the level offscreen through Level.draw
+    level = Level(level_data)
+    surface = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE))
+    surface.fill(WHITE)
+    level.draw(surface)
+    thumbnail = pygame.transform.smoothscale(surface, (size, size))
+    partial = f"{path}.{os.getpid()}.png"
+    pygame.image.save(thumbnail, partial)
+    os.replace(partial, path)
+    return path
+
+class LevelSelect:
+    # Grid of level thumbnails. Thumbnails are cached on disk by level hash, loaded
+    # lazily as rows scroll into view, and only missing ones are rendered in a
+    # process pool.
+    def __init__(self, catalog, cache_dir=THUMBNAIL_CACHE_DIR):
+        self.catalog = catalog
+        self.cache_dir = cache_dir
+        self.font = pygame.font.Font(None, 28)
+        self.thumbnails = {}  # Level hash -> Surface, or None if rendering failed
+        self.pending = {}  # Level hash -> Future
+        self.pool = None
+        self.active = False
+        self.selected = 0
+        self.scroll = 0  # First visible row
+        self.chosen = None
+        self.dirty = False
+        self.pruned = False
+
+    def cache_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}-v{THUMBNAIL_VERSION}.png")
+
+    def prune_cache(self):
+        # Thumbnails of levels no longer in the catalog, or of an older version, are
+        # never shown again
+        if not os.path.isdir(self.cache_dir):
+            return
+        current = {os.path.basename(self.cache_path(key)) for key in self.catalog.hashes}
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".png") and name not in current:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:  # Removed by another game at the same time
+                    pass
+
+    def rows(self):
+        return (len(self.catalog) + THUMBNAIL_COLUMNS - 1) // THUMBNAIL_COLUMNS
+
+    def visible_rows(self):
+        return WINDOW_SIZE // THUMBNAIL_CELL
+
+    def open(self, current):
+        if not self.pruned:
+            self.prune_cache()
+            self.pruned = True
+        self.active = True
+        self.chosen = None
+        self.select(current)
+        self.dirty = True
+
+    def select(self, index):
+        self.selected = max(0, min(len(self.catalog) - 1, index))
+        row = self.selected // THUMBNAIL_COLUMNS
+        if row < self.scroll:
+            self.scroll = row
+        elif row >= self.scroll + self.visible_rows():
+            self.scroll = row - self.visible_rows() + 1
+        self.dirty = True
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            if event.key in (pygame.K_ESCAPE, pygame.K_l):
+                self.active = False
+            elif event.key == pygame.K_RETURN:
+                self.chosen = self.selected
+                self.active = False
+            elif event.key == pygame.K_LEFT:
+                self.select(self.selected - 1)
+            elif event.key == pygame.K_RIGHT:
+                self.select(self.selected + 1)
+            elif event.key == pygame.K_UP:
+                self.select(self.selected - THUMBNAIL_COLUMNS)
+            elif event.key == pygame.K_DOWN:
+                self.select(self.selected + THUMBNAIL_COLUMNS)
+            elif event.key == pygame.K_PAGEUP:
+                self.select(self.selected - THUMBNAIL_COLUMNS * self.visible_rows())
+            elif event.key == pygame.K_PAGEDOWN:
+                self.select(self.selected + THUMBNAIL_COLUMNS * self.visible_rows())
+        elif event.type == pygame.MOUSEWHEEL:
+            self.scroll = max(0, min(self.rows() - self.visible_rows(), self.scroll - event.y))
+            self.dirty = True
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            index = (self.scroll + event.pos[1] // THUMBNAIL_CELL) * THUMBNAIL_COLUMNS + event.pos[0] // THUMBNAIL_CELL
+            if index < len(self.catalog):
+                self.chosen = index
+                self.active = False
+
+    def visible_levels(self):
+        first = self.scroll * THUMBNAIL_COLUMNS
+        return range(first, min(len(self.catalog), first + self.visible_rows() * THUMBNAIL_COLUMNS))
+
+    def update(self):
+        # Collects finished renders and requests thumbnails for the visible rows only
+        for key, future in list(self.pending.items()):
+            if future.done():
+                del self.pending[key]
+                try:
+                    self.thumbnails[key] = pygame.image.load(future.result())
+                except Exception as error:
+                    print(f"Thumbnail {key} failed: {error}")
+                    self.thumbnails[key] = None
+                self.dirty = True
+
+        for index in self.visible_levels():
+            key = self.catalog.hashes[index]
+            if key in self.thumbnails or key in self.pending:
+                continue
+            path = self.cache_path(key)
+            if os.path.exists(path):
+                self.thumbnails[key] = pygame.image.load(path)
+                self.dirty = True
+            else:
+                if self.pool is None:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    self.pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+                self.pending[key] = self.pool.submit(render_thumbnail, thaw_level(self.catalog[index]), path)
+
+        dirty, self.dirty = self.dirty, False
+        return dirty
+
+    def draw(self, screen):
+        screen.fill(WHITE)
+        padding = (THUMBNAIL_CELL - THUMBNAIL_SIZE) // 2
+        for index in self.visible_levels():
+            row, column = divmod(index, THUMBNAIL_COLUMNS)
+            x = column * THUMBNAIL_CELL + padding
+            y = (row - self.scroll) * THUMBNAIL_CELL + padding // 2
+            rect = pygame.Rect(x, y, THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+            thumbnail = self.thumbnails.get(self.catalog.hashes[index])
+            if thumbnail is not None:
+                screen.blit(thumbnail, rect)
+            else:
+                pygame.draw.rect(screen, GRAY, rect)
+            pygame.draw.rect(screen, RED if index == self.selected else BLACK, rect, 3 if index == self.selected else 1)
+            label = self.font.render(str(index + 1), True, BLACK)
+            screen.blit(label, (rect.centerx - label.get_width() // 2, rect.bottom + 4))
+
+    def take_choice(self):
+        chosen, self.chosen = self.chosen, None
+        return chosen
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+def entry_masks(level_data):
+    # ReachabilityMap entry masks for every cell of canonical level data that isn't
+    # open from all sides. The map is optimistic: doors with a button count as open,
+    # ice as floor, and moving platforms and rotating blocks are ignored, so cells it
+    # leaves out can never be reached.
+    masks = {}
+    for wall in level_data["walls"]:
+        masks[wall] = 0
+    for door in level_data["doors"][len(level_data["buttons"]):]:
+        masks[door] = 0  # Doors without a button never open
+    for path in reversed(level_data["one_way_paths"]):  # The first path on a cell wins
+        if masks.get(path["pos"]) != 0:
+            dx, dy = path["direction"]
+            masks[path["pos"]] = sum(bit for (mx, my), bit in DIRECTION_BITS.items() if dx * mx + dy * my > 0)
+    return masks
+
+def jump_links(level_data):
+    links = {(teleporter["pos"], teleporter["target"]) for teleporter in level_data["teleporters"]
+             if in_grid(teleporter["target"])}
+    portals = level_data["portals"]
+    for i in range(0, len(portals) - 1, 2):
+        links.update({(portals[i], portals[i + 1]), (portals[i + 1], portals[i])})
+    return links
+
+class LevelEditor:
+    # Places and removes entities on the grid of one level. The running Level is
+    # rebuilt layer by layer after each edit, and the reachability overlay is
+    # repaired incrementally from the cells and jumps the edit changed.
+    def __init__(self, level_data, number, path):
+        self.number = number
+        self.path = path
+        self.data = thaw_level(level_data)
+        self.key = level_hash(self.data)  # The data as opened, to tell whether anything was edited
+        self.canonical = canonical_level(self.data)
+        self.level = Level(self.canonical)
+        self.font = pygame.font.Font(None, 28)
+        self.hud = HudText(self.font)
+        self.tool = 0
+        self.direction = (1, 0)  # For one-way paths and moving platforms
+        self.color = 0  # Index into COLORS for color switches and doors
+        self.first = None  # First cell of a two-click placement
+        self.active = True
+        self.saved = True
+        self.notice = None  # Shown in the HUD until the next key
+        self.dirty = True
+
+        self.masks = entry_masks(self.canonical)
+        self.links = jump_links(self.canonical)
+        self.reachability = ReachabilityMap(GRID_SIZE, GRID_SIZE)
+        for cell, mask in self.masks.items():
+            self.reachability.set_entry(cell, mask)
+        for source, target in self.links:
+            self.reachability.link(source, target)
+        self.reachability.set_source(self.canonical["player"])
+        self.overlay = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE), pygame.SRCALPHA)
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            self.notice = None
+            if event.key in (pygame.K_ESCAPE, pygame.K_e):
+                self.active = False
+            elif event.key == pygame.K_TAB:
+                step = -1 if event.mod & pygame.KMOD_SHIFT else 1
+                self.tool = (self.tool + step) % len(EDITOR_TOOLS)
+                self.first = None
+            elif event.key in KEY_DIRECTIONS:
+                self.direction = KEY_DIRECTIONS[event.key]
+            elif event.key == pygame.K_c:
+                self.color = (self.color + 1) % len(COLORS)
+            elif event.key == pygame.K_s:
+                self.save()
+            self.dirty = True
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button in (1, 3):
+            self.edit((event.pos[0] // BLOCK_SIZE, event.pos[1] // BLOCK_SIZE), event.button == 1, True)
+        elif event.type == pygame.MOUSEMOTION and (event.buttons[0] or event.buttons[2]):
+            # Dragging paints single-cell entities or erases
+            self.edit((event.pos[0] // BLOCK_SIZE, event.pos[1] // BLOCK_SIZE), event.buttons[0], False)
+
+    def edit(self, cell, place, click):
+        if not in_grid(cell):
+            return
+        tool = EDITOR_TOOLS[self.tool]
+        if not place:
+            if not self.remove(cell):
+                return
+        elif tool in ("player", "goal"):
+            if not click or cell == tuple(self.data[tool]):
+                return
+            self.data[tool] = cell
+        elif tool in ("teleporters", "portals", "buttons"):
+            # Two clicks: the entity, then its target, partner portal or door
+            if not click:
+                return
+            if self.first is None or self.first == cell:
+                self.first = cell
+                self.dirty = True
+                return
+            first, self.first = self.first, None
+            self.remove(first)
+            self.remove(cell)
+            if tool == "teleporters":
+                self.data["teleporters"].append({"pos": first, "target": cell})
+            elif tool == "portals":
+                self.data["portals"].extend([first, cell])
+            else:
+                # Buttons and doors pair by index, so the new pair goes in after the last
+                # paired one, ahead of any door or button without a partner
+                index = min(len(self.data["buttons"]), len(self.data["doors"]))
+                self.data["buttons"].insert(index, first)
+                self.data["doors"].insert(index, cell)
+        else:
+            if not click and tool not in ("walls", "ice", "keys"):
+                return
+            self.remove(cell)
+            color = list(COLORS)[self.color]
+            self.data[tool].append({
+                "one_way_paths": {"pos": cell, "direction": self.direction},
+                "color_switches": {"pos": cell, "color": color},
+                "color_doors": {"pos": cell, "color": color},
+                "moving_platforms": {"pos": cell, "direction": self.direction, "range": 3, "speed": 0.02},
+                "rotating_blocks": {"pos": cell, "speed": 0.001, "direction": (1, 0)}
+            }.get(tool, cell))
+        self.apply()
+
+    def remove(self, cell):
+        # Removes every entity on the cell, with the portal or door it is paired with
+        data = self.data
+        removed = False
+        for name in ("walls", "ice", "keys"):
+            kept = [pos for pos in data[name] if tuple(pos) != cell]
+            removed |= len(kept) < len(data[name])
+            data[name] = kept
+        for name in ("moving_platforms", "rotating_blocks", "teleporters", "one_way_paths", "color_switches",
+                     "color_doors"):
+            kept = [entry for entry in data[name] if tuple(entry["pos"]) != cell]
+            removed |= len(kept) < len(data[name])
+            data[name] = kept
+        portals = data["portals"]
+        for i in reversed(range(0, len(portals) - 1, 2)):
+            if cell in (tuple(portals[i]), tuple(portals[i + 1])):
+                del portals[i:i + 2]
+                removed = True
+        for i in reversed(range(max(len(data["buttons"]), len(data["doors"])))):
+            if cell in [tuple(data[name][i]) for name in ("buttons", "doors") if i < len(data[name])]:
+                for name in ("buttons", "doors"):
+                    if i < len(data[name]):
+                        del data[name][i]
+                removed = True
+        return removed
+
+    def apply(self):
+        canonical = canonical_level(self.data)
+        self.level.reload(self.canonical, canonical)
+        if canonical["player"] != self.canonical["player"]:
+            self.level.set_player_pos(canonical["player"])
+            self.reachability.set_source(canonical["player"])
+        self.canonical = canonical
+
+        # Only cells and jumps whose entry rules changed go to the reachability map
+        masks = entry_masks(canonical)
+        for cell in self.masks.keys() | masks.keys():
+            if self.masks.get(cell, ALL_DIRECTIONS) != masks.get(cell, ALL_DIRECTIONS):
+                self.reachability.set_entry(cell, masks.get(cell, ALL_DIRECTIONS))
+        links = jump_links(canonical)
+        for source, target in self.links - links:
+            self.reachability.unlink(source, target)
+        for source, target in links - self.links:
+            self.reachability.link(source, target)
+        self.masks, self.links = masks, links
+        self.saved = False
+        self.dirty = True
+
+    def save(self):
+        if self.path is None:
+            self.notice = "start with --levels-dir to save"
+            return
+        # One layer per line, written whole so a level watcher never reads half a file
+        data = thaw_level(self.canonical)
+        text = "{\n" + ",\n".join(f"  {json.dumps(name)}: {json.dumps(value)}" for name, value in data.items()) + "\n}\n"
+        partial = f"{self.path}.{os.getpid()}.tmp"
+        with open(partial, "w") as file:
+            file.write(text)
+        os.replace(partial, self.path)
+        self.saved = True
+        print(f"Saved level {self.number} to {self.path}")
+
+    def update(self):
+        self.reachability.step(EDITOR_BUDGET_MS)
+        if self.reachability.done:
+            for index in self.reachability.take_changed():
+                x, y = self.reachability.cell(index)
+                color = REACHABLE_TINT if self.reachability.reached[index] else (0, 0, 0, 0)
+                self.overlay.fill(color, pygame.Rect(x * BLOCK_SIZE, y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE))
+                self.dirty = True
+            if self.reachability.is_reachable(self.canonical["goal"]):
+                status = "goal reachable"
+            else:
+                status = "goal unreachable"
+        else:
+            status = "checking..."
+        tool = EDITOR_TOOLS[self.tool]
+        detail = {"one_way_paths": self.direction, "moving_platforms": self.direction,
+                  "color_switches": list(COLORS)[self.color], "color_doors": list(COLORS)[self.color]}.get(tool)
+        text = f"Edit {self.number}: {tool}" + (f" {detail}" if detail else "") + f" | {self.notice or status}"
+        if self.hud.set(text + ("" if self.saved else " *")):
+            self.dirty = True
+        dirty, self.dirty = self.dirty, False
+        return dirty
+
+    def draw(self, screen):
+        screen.fill(WHITE)
+        self.level.draw(screen)
+        screen.blit(self.overlay, (0, 0))
+        for teleporter in self.level.teleporters:
+            pygame.draw.line(screen, PURPLE, teleporter.rect.center,
+                             (teleporter.target + Vector2(0.5, 0.5)) * BLOCK_SIZE, 2)
+        for button, door in zip(self.level.buttons, self.level.doors):
+            pygame.draw.line(screen, RED, button.rect.center, door.rect.center, 1)
+        if self.first is not None:
+            rect = pygame.Rect(self.first[0] * BLOCK_SIZE, self.first[1] * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE)
+            pygame.draw.rect(screen, GREEN, rect, 4)
+        screen.blit(self.hud.surface, (10, 10))
+
+class ReplayRecorder:
+    # Appends one JSON line per level attempt with every applied move. Move times are
+    # ticks since the attempt began, each with the tick of the level update before it,
+    # so a replay can drive Level.update with the same clock.
+    def __init__(self, path):
+        self.file = open(path, "a")
+        self.attempt = None
+
+    def begin(self, number, key, current_time):
+        self.end(current_time)
+        self.attempt = {"level": number, "hash": key, "start": current_time, "inputs": []}
+        self.last_update = None
+
+    def update(self, current_time):
+        self.last_update = current_time - self.attempt["start"]
+
+    def move(self, direction, current_time):
+        self.attempt["inputs"].append([current_time - self.attempt["start"], direction.x, direction.y,
+                                       self.last_update])
+
+    def end(self, current_time):
+        if self.attempt is None:
+            return
+        self.attempt["duration"] = current_time - self.attempt["start"]
+        self.file.write(json.dumps(self.attempt) + "\n")
+        self.file.flush()
+        self.attempt = None
+
+    def close(self):
+        self.end(pygame.time.get_ticks())
+        self.file.close()
+
+class SamplingProfiler:
+    # Samples the game loop's stack from a background thread through
+    # sys._current_frames, so the loop itself runs untraced. Samples are counted per
+    # stack under the level being played and written in the collapsed format that
+    # flamegraph tools read: "level 7;main (omgwip.py:1);... count".
+    def __init__(self, path, interval=PROFILE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.thread_id = threading.get_ident()  # The thread that creates it is sampled
+        self.level = None  # Set by the game loop, read by the sampler
+        self.counts = {}  # (level, tuple of code objects from the root) -> samples
+        self.names = {}  # Code object -> frame name
+        self.thread = None
+        self.stopped = threading.Event()
+
+    @property
+    def running(self):
+        return self.thread is not None
+
+    def start(self):
+        if self.running:
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="profiler", daemon=True)
+        self.thread.start()
+        print(f"Profiling to {self.path}")
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            key = (self.level, tuple(reversed(stack)))
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def frame_name(self, code):
+        name = self.names.get(code)
+        if name is None:
+            name = self.names[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return name
+
+    def stop(self):
+        # Writes every sample of the session so far, so toggling again adds to the file
+        if not self.running:
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.thread = None
+        lines = []
+        for (level, stack), count in self.counts.items():
+            frames = [f"level {level}"] + [self.frame_name(code) for code in stack]
+            lines.append(f"{';'.join(frames)} {count}")
+        with open(self.path, "w") as file:
+            file.write("\n".join(sorted(lines)) + "\n")
+        print(f"Wrote {sum(self.counts.values())} profile samples to {self.path}")
+
+def quit_game(input_queue, preloader, level_select, telemetry, recorder, watcher, profiler, timings):
+    if timings:
+        print(input_queue.report())
+    profiler.stop()
+    if watcher is not None:
+        watcher.stop()
+    preloader.shutdown()
+    level_select.shutdown()
+    if telemetry is not None:
+        telemetry.save()
+    if recorder is not None:
+        recorder.close()
+    pygame.quit()
+    sys.exit()
+
 def get_levels():
     levels = [
         # Level 1: Simple Walls
@@ -915,74 +2466,280 @@ def get_levels():
     
     return levels
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Break The Puzzle!")
+    parser.add_argument("--level-report", action="store_true",
+                        help="print how many unique levels there are and exit")
+    parser.add_argument("--telemetry", metavar="PATH",
+                        help="count visits, blocked moves and restarts per cell into an .npz store")
+    parser.add_argument("--record", metavar="PATH",
+                        help="append every level attempt's moves to a replay file for omgwip_replay.py")
+    parser.add_argument("--levels-dir", metavar="DIR",
+                        help="load levels from JSON/TOML files in DIR and reload them live when they change")
+    parser.add_argument("--profile", metavar="PATH", nargs="?", const=PROFILE_PATH,
+                        help=f"sample the game loop from the start and write collapsed stacks to PATH "
+                             f"(default {PROFILE_PATH}); F9 toggles it during play")
+    parser.add_argument("--timings", action="store_true",
+                        help="print each level transition's frame time and an input latency report on exit")
+    return parser.parse_args(argv)
+
 def main():
+    args = parse_args()
+    levels = LevelCatalog(get_levels())
+    level_paths = load_level_files(levels, args.levels_dir) if args.levels_dir else {}
+    if args.level_report:
+        print(levels.report())
+        return
+    
     screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE))
     pygame.display.set_caption("Break The Puzzle!")
     clock = pygame.time.Clock()
     
-    # Get levels and initialize first level
-    levels = get_levels()
+    # Initialize first level
     if not levels:
         print("Error: No levels found!")
         pygame.quit()
         sys.exit()
         
+    telemetry = None
+    if args.telemetry:
+        if np is None:
+            print("Telemetry needs NumPy, running without it")
+        else:
+            telemetry = Telemetry(args.telemetry)
+        
+    recorder = ReplayRecorder(args.record) if args.record else None
+        
     current_level = 0
-    level = Level(levels[current_level])
+    level = build_level(levels, current_level, telemetry)
+    start_ticks = pygame.time.get_ticks()
+    level.start(start_ticks)
+    if recorder is not None:
+        recorder.begin(current_level + 1, levels.hashes[current_level], start_ticks)
     total_score = 0
     font = pygame.font.Font(None, 36)
     last_move_time = 0
+    input_queue = InputQueue()
+    score_hud = HudText(font)
+    level_hud = HudText(font)
+    moves_hud = HudText(font)
+    hint_hud = HudText(font)
+    hint = None  # HintEngine while the hint is toggled on with H
+    needs_redraw = True
+    pygame.time.set_timer(SCORE_TICK, SCORE_TICK_MS)
+    preloader = LevelPreloader(levels, telemetry)
+    preloader.preload(current_level + 1)
+    level_select = LevelSelect(levels)
+    watcher = LevelWatcher(args.levels_dir) if args.levels_dir else None
+    reloaded = None  # (level index, change event, rebuilt layers) waiting to reach the screen
+    profiler = SamplingProfiler(args.profile or PROFILE_PATH)
+    if args.profile:
+        profiler.start()
+    editor = None  # LevelEditor while editing the current level with E
     
+    last_poll = time.perf_counter()
     while True:
+        events = pygame.event.get()
+        # Events in a batch arrived some time after the previous poll; taking that
+        # time counts the worst case wait for the poll in each press's latency
+        arrived, last_poll = last_poll, time.perf_counter()
+        # Static scenes block on input or the score tick instead of spinning at FPS
+        if level_select.active:
+            idle = not level_select.pending
+        elif editor is not None:
+            idle = editor.reachability.done
+        else:
+            idle = input_queue.is_idle() and level.is_static() and (hint is None or hint.done)
+        if not events and not needs_redraw and idle:
+            events = [pygame.event.wait()]
+            arrived = last_poll = time.perf_counter()
+        frame_start = time.perf_counter()
         current_time = pygame.time.get_ticks()
+        transition = None
+        profiler.level = current_level + 1
         
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                quit_game(input_queue, preloader, level_select, telemetry, recorder, watcher, profiler,
+                          args.timings)
+            if event.type == LEVEL_FILE_CHANGED:
+                # Only the changed file is parsed; a bad or half-written file keeps the old level
+                try:
+                    level_data = read_level_file(event.path)
+                except Exception as error:
+                    print(f"Level file {event.path} not reloaded: {error}")
+                    continue
+                index = level_paths.get(event.path, level_file_index(levels, event.path))
+                changed = None
+                if index is None:
+                    levels.append(level_data)
+                    index = len(levels) - 1
+                elif index == current_level:
+                    old_data = levels[index]
+                    try:
+                        changed = reload_level(levels, index, level, level_data, telemetry)
+                    except Exception as error:
+                        # Anything the checks missed: back to the old data and a fresh level
+                        print(f"Level file {event.path} not reloaded: {error}")
+                        levels.replace(index, old_data)
+                        level = build_level(levels, index, telemetry)
+                        level.start(current_time)
+                        needs_redraw = True
+                        continue
+                    if hint is not None:
+                        hint = levels.artifact(current_level, "hint", lambda: HintEngine(level))
+                    if recorder is not None:
+                        # The old attempt's moves don't replay on the new data
+                        recorder.begin(current_level + 1, levels.hashes[current_level], current_time)
+                    needs_redraw = True
+                else:
+                    levels.replace(index, level_data)
+                level_paths[event.path] = index
+                if preloader.index == index:
+                    preloader.preload(index)
+                level_select.dirty = True
+                reloaded = (index, event, changed)
+                continue
+            if editor is not None:
+                editor.handle_event(event)
+                if not editor.active:
+                    # Edits go straight into play, saved or not
+                    # Only real edits replace the level, so a hot reload that came in while
+                    # the editor was open is kept when nothing was edited
+                    if level_hash(editor.data) != editor.key:
+                        reload_level(levels, current_level, level, editor.data, telemetry)
+                        if hint is not None:
+                            hint = levels.artifact(current_level, "hint", lambda: HintEngine(level))
+                        if recorder is not None:
+                            recorder.begin(current_level + 1, levels.hashes[current_level], current_time)
+                        level_select.dirty = True
+                    editor = None
+                    needs_redraw = True
+                continue
+            if level_select.active:
+                level_select.handle_event(event)
+                if not level_select.active:
+                    if level_select.chosen is None:
+                        level.resume()
+                    needs_redraw = True
+                continue
             
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
-                    pygame.quit()
-                    sys.exit()
+                    quit_game(input_queue, preloader, level_select, telemetry, recorder, watcher, profiler,
+                          args.timings)
                 elif event.key == pygame.K_r:
-                    level = Level(levels[current_level])
+                    if level.telemetry is not None:
+                        level.record(RESTARTS, level.player.pos)
+                    level = build_level(levels, current_level, telemetry)
+                    level.start(current_time)
+                    input_queue.clear()
+                    if recorder is not None:
+                        recorder.begin(current_level + 1, levels.hashes[current_level], current_time)
+                    needs_redraw = True
+                elif event.key == pygame.K_h and current_level < len(levels):
+                    hint = None if hint else levels.artifact(current_level, "hint", lambda: HintEngine(level))
+                    needs_redraw = True
+                elif event.key == pygame.K_l:
+                    level_select.open(current_level)
+                    level.pause()
+                    input_queue.reset()
+                elif event.key == pygame.K_e and current_level < len(levels):
+                    # Saved back to the file the level came from, or under its number so
+                    # --levels-dir picks it up; without a levels directory there is nowhere to save
+                    path = None
+                    if args.levels_dir:
+                        paths = [name for name, index in level_paths.items() if index == current_level]
+                        path = paths[-1] if paths else os.path.join(args.levels_dir, f"{current_level + 1}.json")
+                    editor = LevelEditor(levels[current_level], current_level + 1, path)
+                    input_queue.reset()
+                    needs_redraw = True
+                elif event.key == pygame.K_F9:
+                    if profiler.running:
+                        profiler.stop()
+                    else:
+                        profiler.start()
+                elif event.key in KEY_DIRECTIONS:
+                    input_queue.press(event.key, current_time, arrived)
+            elif event.type == pygame.KEYUP and event.key in KEY_DIRECTIONS:
+                input_queue.release(event.key)
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                needs_redraw = True
         
-        # Handle continuous key presses with delay
-        if current_time - last_move_time >= MOVE_DELAY:
-            keys = pygame.key.get_pressed()
-            moved = False
-            
-            if keys[pygame.K_LEFT]:
-                level.move_player(Vector2(-1, 0))
-                moved = True
-            elif keys[pygame.K_RIGHT]:
-                level.move_player(Vector2(1, 0))
-                moved = True
-            elif keys[pygame.K_UP]:
-                level.move_player(Vector2(0, -1))
-                moved = True
-            elif keys[pygame.K_DOWN]:
-                level.move_player(Vector2(0, 1))
-                moved = True
-                
-            if moved:
-                last_move_time = current_time
+        # The level select screen replaces play until a level is chosen or it is closed
+        if level_select.chosen is not None:
+            current_level = level_select.take_choice()
+            level, _ = preloader.take(current_level, current_time)
+            preloader.preload(current_level + 1)
+            if recorder is not None:
+                recorder.begin(current_level + 1, levels.hashes[current_level], current_time)
+            if hint is not None:
+                hint = levels.artifact(current_level, "hint", lambda: HintEngine(level))
+            needs_redraw = True
+        if level_select.active:
+            if level_select.update() or needs_redraw:
+                level_select.draw(screen)
+                pygame.display.flip()
+                needs_redraw = False
+            clock.tick(FPS)
+            continue
+        # So does the editor until it is closed
+        if editor is not None:
+            if editor.update() or needs_redraw:
+                editor.draw(screen)
+                pygame.display.flip()
+                needs_redraw = False
+            clock.tick(FPS)
+            continue
+        
+        # Apply at most one queued or repeated move per frame
+        direction = input_queue.next_move(current_time, last_move_time)
+        if direction is not None:
+            level.move_player(direction)
+            if recorder is not None:
+                recorder.move(direction, current_time)
+            last_move_time = current_time
+            needs_redraw = True
         
         # Update moving platforms and other elements
-        level.update()
+        level.update(current_time)
+        if recorder is not None:
+            recorder.update(current_time)
         
-        # Draw everything
-        screen.fill(WHITE)
-        level.draw(screen)
+        # Advance the hint search within its per-frame budget
+        if hint is not None:
+            hint.request(hint.state_of(level))
+            hint.step()
+            if not hint.done:
+                hint_status = 'Hint: searching...'
+            elif hint.direction() is None:
+                hint_status = 'Hint: no path'
+            else:
+                hint_status = 'Hint'
+            if hint_hud.set(hint_status):
+                needs_redraw = True
         
-        # Draw HUD
-        score_text = font.render(f'Score: {level.get_score()}', True, BLACK)
-        level_text = font.render(f'Level: {current_level + 1}/{len(levels)}', True, BLACK)
-        moves_text = font.render(f'Moves: {level.moves}', True, BLACK)
-        screen.blit(score_text, (10, 10))
-        screen.blit(level_text, (10, 50))
-        screen.blit(moves_text, (10, 90))
+        # HUD surfaces are cached and only re-rendered when their values change
+        if score_hud.set(f'Score: {level.get_score()}'):
+            needs_redraw = True
+        if level_hud.set(f'Level: {current_level + 1}/{len(levels)}'):
+            needs_redraw = True
+        if moves_hud.set(f'Moves: {level.moves}'):
+            needs_redraw = True
+        
+        # Draw everything
+        redraw = needs_redraw or not level.is_static()
+        if redraw:
+            screen.fill(WHITE)
+            level.draw(screen)
+            screen.blit(score_hud.surface, (10, 10))
+            screen.blit(level_hud.surface, (10, 50))
+            screen.blit(moves_hud.surface, (10, 90))
+            if hint is not None:
+                screen.blit(hint_hud.surface, (10, 130))
+                if hint.direction() is not None:
+                    draw_hint(screen, level, hint.direction())
+            needs_redraw = False
         
         # Check win condition
         if level.is_complete():
@@ -995,11 +2752,35 @@ def main():
                 final_score_text = font.render(f'Final Score: {total_score}', True, BLACK)
                 screen.blit(complete_text, (WINDOW_SIZE/2 - 100, WINDOW_SIZE/2 - 50))
                 screen.blit(final_score_text, (WINDOW_SIZE/2 - 100, WINDOW_SIZE/2 + 50))
+                redraw = True
             else:
-                # Next level
-                level = Level(levels[current_level])
+                # Next level, swapped in from the preloader
+                level, transition = preloader.take(current_level, current_time)
+                preloader.preload(current_level + 1)
+                if recorder is not None:
+                    recorder.begin(current_level + 1, levels.hashes[current_level], current_time)
+                if hint is not None:
+                    hint = levels.artifact(current_level, "hint", lambda: HintEngine(level))
+                input_queue.clear()
+                needs_redraw = True
         
-        pygame.display.flip()
+        if redraw:
+            pygame.display.flip()
+            input_queue.shown(time.perf_counter())
+        if reloaded is not None:
+            index, event, changed = reloaded
+            if changed is None:
+                print(f"Reloaded level {index + 1} from {event.path}")
+            else:
+                rebuilt = ", ".join(sorted(changed)) or "nothing"
+                print(f"Reloaded level {index + 1} from {event.path} (rebuilt {rebuilt}): "
+                      f"{(time.perf_counter() - event.detected) * 1000:.1f} ms to screen, "
+                      f"{(time.time() - event.modified) * 1000:.0f} ms since saved")
+            reloaded = None
+        if transition is not None and args.timings:
+            frame_ms = (time.perf_counter() - frame_start) * 1000
+            source = "preloaded" if transition else "built in frame"
+            print(f"Level {current_level + 1} transition frame: {frame_ms:.1f} ms ({source})")
         clock.tick(FPS)
 
 if __name__ == "__main__":
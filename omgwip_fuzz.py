@@ -0,0 +1,231 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Headless, no window needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from pygame import Vector2
+
+from omgwip import (Level, LevelCatalog, MoveTable, get_levels, thaw_level, grid_cell, in_grid,
+                    KEY_DIRECTIONS, MOVE_DELAY)
+
+DIRECTIONS = tuple(KEY_DIRECTIONS.values())
+ARROWS = {(-1, 0): "L", (1, 0): "R", (0, -1): "U", (0, 1): "D"}
+SEQUENCE_LENGTH = 200
+TASK_MOVES = 50000  # Moves per worker task
+
+class Fuzzer:
+    # Runs move sequences against one level and checks its invariants after every move
+    def __init__(self, level_data, seed):
+        self.rng = random.Random(seed)
+        self.coverage = set()
+        self.corpus = []  # Sequences that reached new coverage
+
+        # One level is built and compiled, then reset between runs
+        self.level = Level(level_data)
+        self.level.move_table = MoveTable(self.level)
+        self.player_start = tuple(self.level.player.pos)
+        self.initial = [(block, block.is_active) for block in
+                        self.level.doors + self.level.keys + self.level.color_doors]
+        self.walls = {grid_cell(wall.pos) for wall in self.level.walls}
+        self.doors = {}
+        for door in self.level.doors:
+            self.doors.setdefault(grid_cell(door.pos), []).append(door)
+
+    def reset(self):
+        # Platforms and rotating blocks follow the clock, so only state moves change is restored
+        level = self.level
+        level.set_player_pos(self.player_start)
+        level.moves = 0
+        level.sliding = False
+        level.slide_direction = Vector2(0, 0)
+        level.active_color = None
+        for block, active in self.initial:
+            block.is_active = active
+        for teleporter in level.teleporters:
+            teleporter.cooldown = 0
+        level.start(0)
+        return level
+
+    def run(self, sequence, track=False):
+        # Returns (index of the failing move, failure) or None
+        level = self.reset()
+        walls, doors = self.walls, self.doors
+        new_coverage = False
+        for i, direction in enumerate(sequence):
+            now = (i + 1) * MOVE_DELAY
+            try:
+                level.update(now)
+                level.move_player(Vector2(direction))
+                # The game updates again after the move; only teleporter cooldowns can differ
+                for teleporter in level.teleporters:
+                    teleporter.update(now)
+            except Exception as error:
+                return i, f"{type(error).__name__}: {error}"
+
+            pos = level.player.pos
+            if not (pos.x.is_integer() and pos.y.is_integer()):
+                return i, "player left the integer grid"
+            cell = (int(pos.x), int(pos.y))
+            if not in_grid(cell):
+                return i, "player left the level"
+            if cell in walls:
+                return i, "player inside a wall"
+            if any(door.is_active for door in doors.get(cell, ())):
+                return i, "player inside an active door"
+            if any(platform.pos == pos for platform in level.moving_platforms):
+                return i, "player inside a moving platform"
+
+            if track:
+                state = (cell, tuple(door.is_active for door in level.doors), level.sliding)
+                if state not in self.coverage:
+                    self.coverage.add(state)
+                    new_coverage = True
+        if new_coverage:
+            self.corpus.append(sequence)
+        return None
+
+    def next_sequence(self, length):
+        # Half the time mutate a sequence that found new states, otherwise start fresh
+        if self.corpus and self.rng.random() < 0.5:
+            sequence = list(self.rng.choice(self.corpus))
+            cut = self.rng.randrange(len(sequence))
+            sequence = sequence[:cut] + [self.rng.choice(DIRECTIONS) for _ in range(length - cut)]
+            for _ in range(self.rng.randint(1, 4)):
+                sequence[self.rng.randrange(len(sequence))] = self.rng.choice(DIRECTIONS)
+            return sequence
+        return [self.rng.choice(DIRECTIONS) for _ in range(length)]
+
+    def shrink(self, sequence, failure):
+        # Delta debugging: drop ever smaller chunks while the same failure still happens
+        sequence = list(sequence)
+        chunk = len(sequence) // 2
+        while chunk >= 1:
+            start = 0
+            while start < len(sequence):
+                candidate = sequence[:start] + sequence[start + chunk:]
+                result = self.run(candidate)
+                if candidate and result is not None and result[1] == failure:
+                    sequence = candidate[:result[0] + 1]
+                else:
+                    start += chunk
+            chunk //= 2
+        return sequence
+
+levels = None  # (hash, level dict) per slot, sent once to each worker process
+work = None  # (level slot, moves) per work item
+next_item = None  # Shared counter handing out work items
+
+def attach_worker(worker_levels, worker_work, counter):
+    global levels, work, next_item
+    levels, work, next_item = worker_levels, worker_work, counter
+
+def take():
+    # Hands out the next work item index, or None once every item is taken
+    with next_item.get_lock():
+        item = next_item.value
+        if item >= len(work):
+            return None
+        next_item.value = item + 1
+    return item
+
+def fuzz_worker(seed, length):
+    # Runs in a worker process: takes work items off the shared counter until they
+    # run out and returns (item, moves run, failures) for each
+    results = []
+    item = take()
+    while item is not None:
+        slot, moves = work[item]
+        key, level_data = levels[slot]
+        results.append((item,) + fuzz_task(level_data, f"{seed}:{key}:{item}", moves, length))
+        item = take()
+    return results
+
+def fuzz_task(level_data, seed, moves, length):
+    # Returns moves run and the minimal failures found
+    fuzzer = Fuzzer(level_data, seed)
+    failures = {}
+    done = 0
+    while done < moves:
+        sequence = fuzzer.next_sequence(length)
+        result = fuzzer.run(sequence, track=True)
+        if result is None:
+            done += len(sequence)
+            continue
+        index, failure = result
+        done += index + 1
+        # Only shrink when this could beat the shortest reproduction found so far
+        if failure in failures and index + 1 >= len(failures[failure]):
+            continue
+        found = fuzzer.shrink(sequence[:index + 1], failure)
+        if failure not in failures or len(found) < len(failures[failure]):
+            failures[failure] = found
+    return done, failures
+
+def as_attempt(number, key, sequence, failure):
+    # Same shape as omgwip.py --record, so omgwip_replay.py can render a failure
+    inputs = [[(i + 1) * MOVE_DELAY, dx, dy, (i + 1) * MOVE_DELAY] for i, (dx, dy) in enumerate(sequence)]
+    return {"level": number, "hash": key, "start": 0, "inputs": inputs,
+            "duration": (len(sequence) + 1) * MOVE_DELAY, "failure": failure}
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzz every level's moves against the game's invariants")
+    parser.add_argument("--moves", type=int, default=1000000, help="total moves to run across all levels")
+    parser.add_argument("--length", type=int, default=SEQUENCE_LENGTH, help="moves per sequence")
+    parser.add_argument("--level", type=int, action="append", help="level number to fuzz, may be repeated")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", help="write minimal failures as replay attempts to this file")
+    args = parser.parse_args()
+
+    # Identical levels only need fuzzing once
+    catalog = LevelCatalog(get_levels())
+    numbers = {}
+    for number in args.level or range(1, len(catalog) + 1):
+        numbers.setdefault(catalog.hashes[number - 1], number)
+
+    # Levels go to each worker once, so tasks carry no level data; each worker takes
+    # items off a shared counter as it frees up
+    keys = list(numbers)
+    per_level = max(1, args.moves // len(numbers))
+    work = [(slot, min(TASK_MOVES, per_level - first))
+            for slot in range(len(keys)) for first in range(0, per_level, TASK_MOVES)]
+    levels = [(key, thaw_level(catalog.unique[key])) for key in keys]
+
+    started = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=context, initializer=attach_worker,
+                               initargs=(levels, work, context.Value("q", 0)))
+    futures = [pool.submit(fuzz_worker, args.seed, args.length) for _ in range(args.workers)]
+    total = 0
+    found = {}  # (level number, failure) -> shortest sequence
+    for future in futures:
+        for item, moves, failures in future.result():
+            number = numbers[keys[work[item][0]]]
+            total += moves
+            for failure, sequence in failures.items():
+                known = found.get((number, failure))
+                if known is None or len(sequence) < len(known):
+                    found[(number, failure)] = sequence
+    pool.shutdown()
+    elapsed = time.perf_counter() - started
+
+    print(f"Ran {total} moves over {len(numbers)} unique levels in {elapsed:.1f} s "
+          f"({total / elapsed:.0f} moves/s)")
+    for (number, failure), sequence in sorted(found.items()):
+        arrows = "".join(ARROWS[direction] for direction in sequence)
+        print(f"level {number}: {failure} after {len(sequence)} moves: {arrows}")
+    if args.out:
+        with open(args.out, "w") as file:
+            for (number, failure), sequence in sorted(found.items()):
+                file.write(json.dumps(as_attempt(number, catalog.hashes[number - 1], sequence, failure)) + "\n")
+    sys.exit(1 if found else 0)
+
+if __name__ == "__main__":
+    main()
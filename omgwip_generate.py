@@ -0,0 +1,233 @@
+import os
+import sys
+import json
+import time
+import heapq
+import random
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Headless, no window needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from omgwip import (Level, MoveTable, HintEngine, level_hash,
+                    COLORS, GRID_SIZE, KEY_DIRECTIONS)
+
+BATCH_SIZE = 250  # Candidates per worker task
+IN_FLIGHT = 4  # Tasks queued per worker so the pool never waits on the writer
+MIN_DISTANCE = GRID_SIZE // 2  # Shortest Manhattan distance from player to goal
+INTERIOR = [(x, y) for x in range(1, GRID_SIZE - 1) for y in range(1, GRID_SIZE - 1)]
+DIRECTIONS = tuple(KEY_DIRECTIONS.values())
+FILE_PREFIX = "generated-"  # Not a level number, so the game adds these as new levels
+
+# Relative weight of each mechanic when placing features. Moving platforms depend
+# on time, which the reachability check leaves out just as the hint does, so they
+# are rarer. Rotating block redirects can leave the player off the grid (see
+# omgwip_fuzz.py), so those are opt-in.
+DEFAULT_MIX = {
+    "ice": 1.0,
+    "one_way_paths": 1.0,
+    "teleporters": 1.0,
+    "portals": 1.0,
+    "doors": 1.0,
+    "keys": 1.0,
+    "color_doors": 1.0,
+    "moving_platforms": 0.5,
+    "rotating_blocks": 0.0
+}
+
+class LevelGenerator:
+    # Builds candidate levels from a seed. Every entity gets a cell of its own, so a
+    # level never depends on which entry Level finds first on a shared cell.
+    def __init__(self, mix, density, features):
+        self.mechanics = [name for name, weight in mix.items() if weight > 0]
+        self.weights = [mix[name] for name in self.mechanics]
+        self.density = density
+        self.features = features
+
+    def generate(self, seed):
+        rng = random.Random(seed)
+        free = INTERIOR[:]
+        rng.shuffle(free)
+        player = free.pop()
+        goal = next((cell for cell in free if abs(cell[0] - player[0]) + abs(cell[1] - player[1]) >= MIN_DISTANCE),
+                    free[0])
+        free.remove(goal)
+
+        level = {"player": player, "goal": goal,
+                 "walls": [(i, 0) for i in range(GRID_SIZE)] + [(i, GRID_SIZE-1) for i in range(GRID_SIZE)] +
+                          [(0, i) for i in range(1, GRID_SIZE-1)] + [(GRID_SIZE-1, i) for i in range(1, GRID_SIZE-1)]}
+        for name in ("moving_platforms", "rotating_blocks", "teleporters", "portals", "ice", "one_way_paths",
+                     "color_switches", "color_doors", "buttons", "doors", "keys"):
+            level[name] = []
+
+        wall_count = int(len(free) * self.density)
+        level["walls"].extend(free[len(free) - wall_count:])
+        del free[len(free) - wall_count:]
+
+        if self.mechanics:
+            for name in rng.choices(self.mechanics, self.weights, k=self.features):
+                if len(free) < 2:
+                    break
+                getattr(self, "place_" + name)(rng, level, free)
+        return level
+
+    def place_ice(self, rng, level, free):
+        # A short run of ice from a random cell so the player can slide along it
+        x, y = free.pop()
+        dx, dy = rng.choice(DIRECTIONS)
+        level["ice"].append((x, y))
+        for _ in range(rng.randint(0, 3)):
+            x, y = x + dx, y + dy
+            if (x, y) not in free:
+                break
+            free.remove((x, y))
+            level["ice"].append((x, y))
+
+    def place_one_way_paths(self, rng, level, free):
+        level["one_way_paths"].append({"pos": free.pop(), "direction": rng.choice(DIRECTIONS)})
+
+    def place_teleporters(self, rng, level, free):
+        # The target cell is kept empty so nothing else is placed where the player lands
+        level["teleporters"].append({"pos": free.pop(), "target": free.pop()})
+
+    def place_portals(self, rng, level, free):
+        level["portals"].extend([free.pop(), free.pop()])
+
+    def place_doors(self, rng, level, free):
+        # Buttons and doors pair by index, so they are always added together
+        level["buttons"].append(free.pop())
+        level["doors"].append(free.pop())
+
+    def place_keys(self, rng, level, free):
+        level["keys"].append(free.pop())
+
+    def place_color_doors(self, rng, level, free):
+        color = rng.choice(list(COLORS))
+        level["color_switches"].append({"pos": free.pop(), "color": color})
+        level["color_doors"].append({"pos": free.pop(), "color": color})
+
+    def place_moving_platforms(self, rng, level, free):
+        level["moving_platforms"].append({"pos": free.pop(), "direction": rng.choice(DIRECTIONS),
+                                          "range": rng.randint(1, 3), "speed": rng.choice((0.01, 0.02, 0.03))})
+
+    def place_rotating_blocks(self, rng, level, free):
+        level["rotating_blocks"].append({"pos": free.pop(), "speed": rng.choice((0.0005, 0.001, 0.002))})
+
+def check_level(level_data):
+    # Fast reachability check over a lazily resolved move table, so only the moves
+    # the search touches are compiled. It follows the hint's successor function but
+    # searches greedy best-first, since any path will do. Returns a reason to reject
+    # the level or None.
+    level = Level(level_data)
+    level.move_table = MoveTable(level, lazy=True)
+    if level.move_table.problems:
+        return "jump problem: " + level.move_table.problems[0]
+    hint = HintEngine(level)
+    start = hint.state_of(level)
+    seen = {start}
+    frontier = [(hint.heuristic(start[:2]), 0, start)]
+    counter = 0
+    while frontier:
+        _, _, state = heapq.heappop(frontier)
+        if state[:2] == hint.goal:
+            return None
+        for direction in (state[3],) if state[3] is not None else DIRECTIONS:
+            nxt = hint.successor(state, direction)
+            if nxt is not None and nxt not in seen:
+                seen.add(nxt)
+                counter += 1
+                heapq.heappush(frontier, (hint.heuristic(nxt[:2]), counter, nxt))
+    return "goal unreachable"
+
+def generate_batch(seed, first, count, mix, density, features):
+    # Runs in a worker process; returns the accepted levels of candidates
+    # first..first+count-1 in order, with their hashes, and the rejection counts.
+    # Every entity has its own cell, so Level builds the generated dict exactly as it
+    # would its canonical form and only accepted levels need hashing.
+    generator = LevelGenerator(mix, density, features)
+    accepted = []
+    rejected = {}
+    for index in range(first, first + count):
+        level_data = generator.generate(f"{seed}:{index}")
+        reason = check_level(level_data)
+        if reason is None:
+            accepted.append((level_hash(level_data), level_data))
+        else:
+            reason = reason.split(":")[0]
+            rejected[reason] = rejected.get(reason, 0) + 1
+    return accepted, rejected
+
+def parse_mix(text):
+    mix = dict(DEFAULT_MIX)
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in mix:
+            raise argparse.ArgumentTypeError(f"unknown mechanic {name!r}, expected one of {', '.join(mix)}")
+        mix[name] = float(weight)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream seeded, solvable levels into a level directory")
+    parser.add_argument("out", help="directory to write one level file per level to, playable with "
+                                    "omgwip.py --levels-dir")
+    parser.add_argument("--count", type=int, default=1000, help="levels to write, 0 to run until interrupted")
+    parser.add_argument("--seed", default="0")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="mechanic weights, e.g. ice=2,portals=0 (unlisted mechanics keep their default)")
+    parser.add_argument("--density", type=float, default=0.2, help="fraction of interior cells that are walls")
+    parser.add_argument("--features", type=int, default=8, help="mechanics placed per level")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+    pending = deque()
+    next_index = 0
+    written = duplicates = candidates = 0
+    rejected = {}
+    started = time.perf_counter()
+    try:
+        while args.count == 0 or written < args.count:
+            # Keep a bounded number of batches in flight and write them in submission
+            # order, so output depends only on the seed and not on the worker count
+            while len(pending) < args.workers * IN_FLIGHT:
+                pending.append(pool.submit(generate_batch, args.seed, next_index, BATCH_SIZE,
+                                           args.mix, args.density, args.features))
+                next_index += BATCH_SIZE
+            accepted, batch_rejected = pending.popleft().result()
+            candidates += BATCH_SIZE
+            for reason, count in batch_rejected.items():
+                rejected[reason] = rejected.get(reason, 0) + count
+            for key, level_data in accepted:
+                # Files are named by level hash, so levels already in the directory are
+                # not written again
+                path = os.path.join(args.out, f"{FILE_PREFIX}{key}.json")
+                if os.path.exists(path):
+                    duplicates += 1
+                    continue
+                # Written under another name first, so a running game watching the
+                # directory never reads half a file
+                with open(path + ".tmp", "w") as file:
+                    json.dump(level_data, file, separators=(",", ":"))
+                os.replace(path + ".tmp", path)
+                written += 1
+                if written == args.count:
+                    break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {written} levels to {args.out} in {elapsed:.1f} s ({written / elapsed:.0f} levels/s) "
+          f"from {candidates} candidates, {duplicates} duplicates")
+    for reason, count in sorted(rejected.items(), key=lambda item: -item[1]):
+        print(f"  rejected {count}: {reason}")
+    if args.count and written < args.count:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os
+import sys
+import argparse
+
+# Render offscreen, no window needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import numpy as np
+
+from omgwip import (Level, LevelCatalog, get_levels, load_level_files, load_telemetry, TELEMETRY_CHANNELS,
+                    BLOCK_SIZE, GRID_SIZE, WINDOW_SIZE, WHITE, BLACK, RED)
+
+HEAT_ALPHA = 200  # Opacity of the busiest cell
+
+def render_heatmap(level_data, counts, font):
+    surface = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE))
+    surface.fill(WHITE)
+    Level(level_data).draw(surface)
+
+    peak = counts.max()
+    if peak == 0:
+        return surface
+    overlay = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE), pygame.SRCALPHA)
+    for y, x in zip(*np.nonzero(counts)):
+        rect = pygame.Rect(x * BLOCK_SIZE, y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE)
+        overlay.fill((*RED, int(HEAT_ALPHA * counts[y, x] / peak)), rect)
+        label = font.render(str(counts[y, x]), True, BLACK)
+        overlay.blit(label, (rect.x + 3, rect.y + 3))
+    surface.blit(overlay, (0, 0))
+    return surface
+
+def main():
+    parser = argparse.ArgumentParser(description="Render telemetry heatmaps over levels")
+    parser.add_argument("store", help="telemetry .npz store written by omgwip.py --telemetry")
+    parser.add_argument("--channel", choices=TELEMETRY_CHANNELS, default="visits")
+    parser.add_argument("--level", type=int, action="append",
+                        help="level number to render, may be repeated (default: every level with data)")
+    parser.add_argument("--out", default="heatmaps", help="directory for the PNG files")
+    parser.add_argument("--levels-dir", help="level files the game was run with, see omgwip.py --levels-dir")
+    args = parser.parse_args()
+
+    store = load_telemetry(args.store)
+    if not store:
+        print(f"No telemetry in {args.store}")
+        sys.exit(1)
+
+    catalog = LevelCatalog(get_levels())
+    if args.levels_dir:
+        load_level_files(catalog, args.levels_dir)
+    channel = TELEMETRY_CHANNELS.index(args.channel)
+    font = pygame.font.Font(None, 18)
+    os.makedirs(args.out, exist_ok=True)
+
+    # Identical levels share one hash, so render each hash once under its first level number
+    numbers = args.level or range(1, len(catalog) + 1)
+    rendered = set()
+    for number in numbers:
+        if not 1 <= number <= len(catalog):
+            print(f"Skipping level {number}: there are {len(catalog)} levels")
+            continue
+        key = catalog.hashes[number - 1]
+        if key not in store or key in rendered:
+            continue
+        rendered.add(key)
+        counts = store[key][channel]
+        if counts.shape != (GRID_SIZE, GRID_SIZE):
+            print(f"Skipping level {number}: recorded with a {counts.shape[0]}x{counts.shape[1]} grid")
+            continue
+        path = os.path.join(args.out, f"level_{number:03d}_{args.channel}.png")
+        pygame.image.save(render_heatmap(catalog[number - 1], counts, font), path)
+        print(f"{path}: {int(counts.sum())} {args.channel}")
+
+    if not rendered:
+        print("No telemetry for the requested levels")
+    # Data for edited or removed levels stays in the store under the old hash
+    unknown = sum(1 for key in store if key not in catalog.unique)
+    if unknown:
+        print(f"Recorded levels not among the known levels: {unknown}"
+              + ("" if args.levels_dir else ", pass the --levels-dir the game was run with"))
+
+if __name__ == "__main__":
+    main()
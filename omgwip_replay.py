@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import struct
+import argparse
+import tempfile
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+
+# Render offscreen under SDL's dummy driver, no window needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from pygame import Vector2
+
+from omgwip import Level, LevelCatalog, get_levels, load_level_files, thaw_level, WINDOW_SIZE, WHITE
+
+try:
+    from PIL import Image
+except ImportError:  # Only needed for GIF output
+    Image = None
+
+REPLAY_FPS = 30
+CHUNK_FRAMES = 90  # Frames per worker task; several per worker keeps the pool balanced
+
+class Replay:
+    # Steps a level through a recorded attempt on the recorded clock
+    def __init__(self, level_data, attempt):
+        self.level = Level(level_data)
+        self.start = attempt["start"]
+        self.inputs = attempt["inputs"]
+        self.next_input = 0
+        self.level.start(self.start)
+
+    def advance(self, t):
+        # Apply every move made up to t ms after the attempt began, with the level
+        # updates the game did around it, then update to t itself
+        while self.next_input < len(self.inputs) and self.inputs[self.next_input][0] <= t:
+            move_time, dx, dy, update_time = self.inputs[self.next_input]
+            if update_time is not None:
+                self.level.update(self.start + update_time)
+            self.level.move_player(Vector2(dx, dy))
+            self.level.update(self.start + move_time)
+            self.next_input += 1
+        self.level.update(self.start + t)
+
+def frame_count(attempt, fps):
+    return math.floor(attempt["duration"] * fps / 1000) + 1
+
+def encode_gif_frame(surface):
+    # A single-frame GIF with its own palette, spliced into the output by GifWriter
+    image = Image.frombytes("RGB", surface.get_size(), pygame.image.tobytes(surface, "RGB"))
+    buffer = BytesIO()
+    image.convert("P", palette=Image.Palette.ADAPTIVE, colors=256).save(buffer, "GIF")
+    return buffer.getvalue()
+
+def render_chunk(level_data, attempt, fps, first, last, out_dir, scale, gif):
+    # Runs in a worker process: fast-forwards to frame first, then draws and writes
+    # frames first..last-1 one at a time
+    replay = Replay(level_data, attempt)
+    surface = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE))
+    size = (int(WINDOW_SIZE * scale), int(WINDOW_SIZE * scale))
+    for frame in range(first, last):
+        replay.advance(frame * 1000 / fps)
+        surface.fill(WHITE)
+        replay.level.draw(surface)
+        output = surface if scale == 1 else pygame.transform.smoothscale(surface, size)
+        if gif:
+            with open(os.path.join(out_dir, f"frame_{frame:06d}.gif"), "wb") as file:
+                file.write(encode_gif_frame(output))
+        else:
+            pygame.image.save(output, os.path.join(out_dir, f"frame_{frame:06d}.png"))
+    return last - first
+
+class GifWriter:
+    # Streams frames into an animated GIF. Each frame keeps its palette as a local
+    # color table, so frames can be quantized independently in worker processes.
+    def __init__(self, path, size, fps):
+        self.file = open(path, "wb")
+        self.delay = max(1, round(100 / fps))  # GIF delays are in hundredths of a second
+        self.file.write(b"GIF89a" + struct.pack("<HHBBB", size[0], size[1], 0, 0, 0))
+        self.file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")  # Loop forever
+
+    def add(self, frame):
+        self.file.write(b"\x21\xf9\x04\x00" + struct.pack("<H", self.delay) + b"\x00\x00")
+
+        # Skip the frame's header and hold on to its global color table
+        flags = frame[10]
+        pos = 13
+        table, table_bits = b"", 0
+        if flags & 0x80:
+            table_bits = flags & 0x07
+            table = frame[pos:pos + (3 << (table_bits + 1))]
+            pos += len(table)
+
+        while frame[pos] == 0x21:  # Skip extensions
+            pos += 2
+            while frame[pos]:
+                pos += frame[pos] + 1
+            pos += 1
+        if frame[pos] != 0x2c:
+            raise ValueError("GIF frame has no image descriptor")
+
+        descriptor = bytearray(frame[pos:pos + 10])
+        pos += 10
+        if descriptor[9] & 0x80:
+            table_bits = descriptor[9] & 0x07
+            table = frame[pos:pos + (3 << (table_bits + 1))]
+            pos += len(table)
+        descriptor[9] = (descriptor[9] & 0x40) | 0x80 | table_bits
+
+        start = pos
+        pos += 1  # LZW minimum code size
+        while frame[pos]:
+            pos += frame[pos] + 1
+        self.file.write(bytes(descriptor) + table + frame[start:pos + 1])
+
+    def close(self):
+        self.file.write(b"\x3b")
+        self.file.close()
+
+def load_attempt(path, index):
+    with open(path) as file:
+        attempts = [json.loads(line) for line in file if line.strip()]
+    if not attempts:
+        print(f"No attempts recorded in {path}")
+        sys.exit(1)
+    return attempts[index]
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a recorded level attempt offscreen to frames")
+    parser.add_argument("replay", help="replay file written by omgwip.py --record")
+    parser.add_argument("out", help="directory for a PNG sequence, or a .gif file")
+    parser.add_argument("--attempt", type=int, default=-1, help="attempt to render, by position in the file (default: last)")
+    parser.add_argument("--fps", type=int, default=REPLAY_FPS)
+    parser.add_argument("--scale", type=float, default=1.0, help="output size relative to the game window")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--levels-dir", help="level files the game was run with, see omgwip.py --levels-dir")
+    args = parser.parse_args()
+
+    attempt = load_attempt(args.replay, args.attempt)
+    catalog = LevelCatalog(get_levels())
+    if args.levels_dir:
+        load_level_files(catalog, args.levels_dir)
+    # Levels are found by the hash recorded with the attempt, not by number, since
+    # numbers shift and levels change as files are added, reloaded or edited
+    if attempt["hash"] not in catalog.unique:
+        print(f"Level {attempt['level']} as recorded ({attempt['hash']}) is not among the known levels"
+              + ("" if args.levels_dir else ", pass the --levels-dir the game was run with"))
+        sys.exit(1)
+    level_data = thaw_level(catalog.unique[attempt["hash"]])
+
+    gif = args.out.lower().endswith(".gif")
+    if gif and Image is None:
+        print("GIF output needs Pillow, write a PNG sequence instead")
+        sys.exit(1)
+    out_dir = tempfile.mkdtemp(prefix="omgwip-replay-") if gif else args.out
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Split the replay into time ranges rendered in parallel
+    total = frame_count(attempt, args.fps)
+    chunks = [(first, min(total, first + CHUNK_FRAMES)) for first in range(0, total, CHUNK_FRAMES)]
+    started = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+    futures = [pool.submit(render_chunk, level_data, attempt, args.fps, first, last, out_dir, args.scale, gif)
+               for first, last in chunks]
+
+    if gif:
+        # Stream chunks into the GIF in order as they finish, one frame in memory at a time
+        size = (int(WINDOW_SIZE * args.scale), int(WINDOW_SIZE * args.scale))
+        writer = GifWriter(args.out, size, args.fps)
+        for (first, last), future in zip(chunks, futures):
+            future.result()
+            for frame in range(first, last):
+                path = os.path.join(out_dir, f"frame_{frame:06d}.gif")
+                with open(path, "rb") as file:
+                    writer.add(file.read())
+                os.remove(path)
+        writer.close()
+        shutil.rmtree(out_dir)
+    else:
+        for future in futures:
+            future.result()
+    pool.shutdown()
+
+    seconds = attempt["duration"] / 1000
+    elapsed = time.perf_counter() - started
+    print(f"Rendered {total} frames ({seconds:.1f} s of play) of level {attempt['level']} to {args.out} "
+          f"in {elapsed:.1f} s, {seconds / elapsed:.1f}x real time")
+
+if __name__ == "__main__":
+    main()